@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+from features.tasks.records import Task
+
+
+def _bump(counts, key, amount):
+    total = counts.get(key, 0) + amount
+    if total:
+        counts[key] = total
+    else:
+        counts.pop(key, None)
+
+
+def _tracked_microseconds(task):
+    return round(task.finished_seconds * 1e6)
+
+
+def _completion_time(task):
+    if task.get("status") != "Completed":
+        return None
+    if task.completed_time and "T" in task["completed_at"]:
+        return task.completed_time
+    if task.get("time_entries") and task["time_entries"][-1].end:
+        # Tasks completed before completion times were recorded: use the end of the last time entry
+        return task["time_entries"][-1].end
+    return None
+
+
+class TaskAggregates:
+    """
+    Task analytics kept up to date as deltas from the store's change notifications.
+
+    Each change subtracts the old version of a task and adds the new one, so a write
+    only looks at the task it touches and reading the analytics does not depend on the
+    number of tasks or time entries. Tracked time is summed in whole microseconds, so
+    subtracting a task leaves no rounding residue behind.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._stale = True
+        self._reset()
+        store.subscribe(self._on_change)
+
+    def _reset(self):
+        self.total_tasks = 0
+        self.tasks_by_status = {}
+        self.tasks_by_priority = {}
+        self.tasks_by_category = {}
+        self.tracked_by_category = {} # Microseconds of finished time entries
+        self.tracked_by_priority = {}
+        self.completed_by_day = {i: 0 for i in range(7)} # 0: Monday, 6: Sunday
+        self.completed_by_hour = {i: 0 for i in range(24)}
+
+    def _add(self, task, sign):
+        task = Task.of(task)
+        priority = task.get("priority", "Unknown")
+        category = task.get("category", "Unknown")
+        self.total_tasks += sign
+        _bump(self.tasks_by_status, task.get("status"), sign)
+        _bump(self.tasks_by_priority, priority, sign)
+        _bump(self.tasks_by_category, category, sign)
+
+        tracked = _tracked_microseconds(task)
+        if tracked > 0:
+            _bump(self.tracked_by_category, category, sign * tracked)
+            _bump(self.tracked_by_priority, priority, sign * tracked)
+
+        completion_time = _completion_time(task)
+        if completion_time:
+            self.completed_by_day[completion_time.weekday()] += sign
+            self.completed_by_hour[completion_time.hour] += sign
+
+    def _on_change(self, changes):
+        if changes is None:
+            self._stale = True
+            return
+        if self._stale:
+            return
+        for old, new in changes:
+            if old is not None:
+                self._add(old, -1)
+            if new is not None:
+                self._add(new, 1)
+
+    def rebuild(self):
+        """
+        Recomputes every aggregate from a full scan of the tasks.
+        """
+        with self.store.transaction():
+            records = self.store.records()
+            self._reset()
+            self._stale = False
+            for task in records:
+                self._add(task, 1)
+
+    @contextmanager
+    def _current(self):
+        # store.transaction() first picks up changes made by other processes.
+        with self.store.transaction():
+            if self._stale:
+                self.rebuild()
+            yield
+
+    def productivity_analytics(self):
+        """
+        Returns the same dict as analytics.get_productivity_analytics(), or None if there are no tasks.
+        """
+        with self._current():
+            if not self.total_tasks:
+                return None
+            completed_tasks = self.tasks_by_status.get("Completed", 0)
+            return {
+                "total_tasks": self.total_tasks,
+                "completed_tasks": completed_tasks,
+                "completion_rate": (completed_tasks / self.total_tasks) * 100,
+                "tasks_by_priority": dict(self.tasks_by_priority),
+                "tasks_by_category": dict(self.tasks_by_category),
+            }
+
+    def advanced_analytics(self):
+        """
+        Returns the same dict as analytics.get_advanced_analytics(), or None if there are no tasks.
+        """
+        with self._current():
+            if not self.total_tasks:
+                return None
+            # Convert microseconds to hours for readability
+            return {
+                "time_by_category": {k: v / 3600e6 for k, v in self.tracked_by_category.items()},
+                "time_by_priority": {k: v / 3600e6 for k, v in self.tracked_by_priority.items()},
+                "tasks_completed_by_day": dict(self.completed_by_day),
+                "tasks_completed_by_hour": dict(self.completed_by_hour),
+            }
@@ -2,16 +2,41 @@ import questionary
 from rich.console import Console
 from rich.table import Table
 import json
+import math
 from datetime import datetime, timedelta
+from features.analytics.aggregates import TaskAggregates
+from features.analytics.snapshot import load_snapshot
+from features.reminders import reminders
+from features.storage.partitions import PerOwner
 from features.tasks import tasks
 
 console = Console()
 
-def get_productivity_analytics():
+# One set of aggregates per owner's tasks (see tasks.py); owner None is the shared data.
+_aggregates = PerOwner(lambda owner: TaskAggregates(tasks.get_task_store(owner)))
+
+def get_productivity_analytics(owner=None):
     """
     This function retrieves productivity analytics data.
+
+    The counts are maintained incrementally as tasks change, so this does not scan the tasks.
+    """
+    return _aggregates(owner).productivity_analytics()
+
+def get_advanced_analytics(owner=None):
+    """
+    This function retrieves advanced analytics data based on time tracking.
+
+    The totals are maintained incrementally as tasks change, so this does not re-parse any time entries.
+    """
+    return _aggregates(owner).advanced_analytics()
+
+def compute_productivity_analytics(all_tasks):
+    """
+    This function computes productivity analytics with a full scan of the given tasks.
+
+    It is the reference the incremental aggregates are verified against.
     """
-    all_tasks = tasks.get_all_tasks()
     if not all_tasks:
         return None
 
@@ -37,11 +62,12 @@ def get_productivity_analytics():
         "tasks_by_category": tasks_by_category,
     }
 
-def get_advanced_analytics():
+def compute_advanced_analytics(all_tasks):
     """
-    This function retrieves advanced analytics data based on time tracking.
+    This function computes time tracking analytics with a full scan of the given tasks.
+
+    It is the reference the incremental aggregates are verified against.
     """
-    all_tasks = tasks.get_all_tasks()
     if not all_tasks:
         return None
 
@@ -64,11 +90,14 @@ def get_advanced_analytics():
             time_by_category[category] = time_by_category.get(category, 0) + total_seconds
             time_by_priority[priority] = time_by_priority.get(priority, 0) + total_seconds
 
-        if task['status'] == 'Completed' and task.get("time_entries"):
-            # For simplicity, we consider the end time of the last time entry as completion time
-            last_entry = task["time_entries"][-1]
-            if last_entry["end_time"]:
-                completion_time = datetime.fromisoformat(last_entry["end_time"])
+        if task['status'] == 'Completed':
+            completion_time = None
+            if task.get("completed_at") and "T" in task["completed_at"]:
+                completion_time = datetime.fromisoformat(task["completed_at"])
+            elif task.get("time_entries") and task["time_entries"][-1]["end_time"]:
+                # Tasks completed before completion times were recorded: use the end of the last time entry
+                completion_time = datetime.fromisoformat(task["time_entries"][-1]["end_time"])
+            if completion_time:
                 tasks_completed_by_day[completion_time.weekday()] += 1
                 tasks_completed_by_hour[completion_time.hour] += 1
     
@@ -83,6 +112,39 @@ def get_advanced_analytics():
         "tasks_completed_by_hour": tasks_completed_by_hour,
     }
 
+def results_match(expected, actual):
+    """
+    This function compares two analytics results, allowing for float rounding.
+    """
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return expected.keys() == actual.keys() and all(results_match(expected[key], actual[key]) for key in expected)
+    if isinstance(expected, float) or isinstance(actual, float):
+        return math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9)
+    return expected == actual
+
+def rebuild_analytics(owner=None):
+    """
+    This function rebuilds the analytics aggregates from scratch and verifies them.
+
+    The aggregates are compared with a full scan both before the rebuild, which checks the
+    incremental updates, and after it.
+
+    Returns:
+        A list of the names of the results that did not match; empty when everything matched.
+    """
+    all_tasks = tasks.get_task_views(owner)
+    expected = {
+        "productivity": compute_productivity_analytics(all_tasks),
+        "advanced": compute_advanced_analytics(all_tasks),
+    }
+    incremental = {"productivity": get_productivity_analytics(owner), "advanced": get_advanced_analytics(owner)}
+    _aggregates(owner).rebuild()
+    rebuilt = {"productivity": get_productivity_analytics(owner), "advanced": get_advanced_analytics(owner)}
+
+    mismatches = [f"incremental {name}" for name in expected if not results_match(expected[name], incremental[name])]
+    mismatches.extend(f"rebuilt {name}" for name in expected if not results_match(expected[name], rebuilt[name]))
+    return mismatches
+
 def display_productivity_analytics():
     """
     This function displays productivity analytics.
@@ -111,93 +173,69 @@ def display_productivity_analytics():
         table_category.add_row(category, str(count))
     console.print(table_category)
 
-def display_daily_weekly_summaries():
+def display_daily_weekly_summaries(snapshot=None):
     """
     This function displays daily and weekly summaries of tasks.
+
+    The deadline counts are time-range queries on the sorted deadline index.
+
+    Args:
+        snapshot: An AnalyticsSnapshot to report on; one is built if it is not given.
     """
-    all_tasks = tasks.get_all_tasks()
-    if not all_tasks:
+    snapshot = snapshot or load_snapshot()
+    if not snapshot:
         console.print("[bold yellow]No tasks found for summaries.[/bold yellow]")
         return
 
-    today = datetime.now().date()
-    start_of_week = today - timedelta(days=today.weekday()) # Monday as start of week
-
     # Daily Summary
-    tasks_completed_today = [task for task in all_tasks if task['status'] == 'Completed' and datetime.strptime(task['created_at'], "%Y-%m-%d").date() == today]
-    tasks_due_today = [task for task in all_tasks if task['deadline'] and datetime.strptime(task['deadline'], "%Y-%m-%d").date() == today and task['status'] != 'Completed']
-
     console.print("\n[bold blue]Daily Summary[/bold blue]")
-    console.print(f"Tasks Completed Today: {len(tasks_completed_today)}")
-    console.print(f"Tasks Due Today: {len(tasks_due_today)}")
+    console.print(f"Tasks Completed Today: {len(snapshot.completed_today)}")
+    console.print(f"Tasks Due Today: {len(tasks.tasks_due_between(snapshot.today, snapshot.today))}")
 
     # Weekly Summary
-    tasks_completed_this_week = [task for task in all_tasks if task['status'] == 'Completed' and datetime.strptime(task['created_at'], "%Y-%m-%d").date() >= start_of_week]
-    tasks_due_this_week = [task for task in all_tasks if task['deadline'] and datetime.strptime(task['deadline'], "%Y-%m-%d").date() >= start_of_week and task['status'] != 'Completed']
-
     console.print("\n[bold blue]Weekly Summary[/bold blue]")
-    console.print(f"Tasks Completed This Week: {len(tasks_completed_this_week)}")
-    console.print(f"Tasks Due This Week: {len(tasks_due_this_week)}")
+    console.print(f"Tasks Completed This Week: {len(snapshot.completed_this_week)}")
+    end_of_week = snapshot.start_of_week + timedelta(days=6)
+    console.print(f"Tasks Due This Week: {len(tasks.tasks_due_between(snapshot.start_of_week, end_of_week))}")
 
-def display_priority_distribution_chart():
+def display_priority_distribution_chart(snapshot=None):
     """
     This function displays an ASCII chart for priority distribution.
+
+    Args:
+        snapshot: An AnalyticsSnapshot to report on; one is built if it is not given.
     """
-    all_tasks = tasks.get_all_tasks()
-    if not all_tasks:
+    snapshot = snapshot or load_snapshot()
+    if not snapshot:
         console.print("[bold yellow]No tasks found for priority distribution chart.[/bold yellow]")
         return
 
-    tasks_by_priority = {}
-    for task in all_tasks:
-        priority = task.get('priority', 'Unknown')
-        tasks_by_priority[priority] = tasks_by_priority.get(priority, 0) + 1
-    
-    total_tasks = len(all_tasks)
-    
     console.print("\n[bold blue]Priority Distribution Chart[/bold blue]")
     
-    for priority, count in tasks_by_priority.items():
-        percentage = (count / total_tasks) * 100
+    for priority, count in snapshot.tasks_by_priority.items():
+        percentage = (count / snapshot.total_tasks) * 100
         bar = "█" * int(percentage / 2)
         console.print(f"{priority:<10} | {bar} {percentage:.2f}%")
 
-def display_productivity_score():
+def display_productivity_score(snapshot=None):
     """
     This function calculates and displays a productivity score.
+
+    Args:
+        snapshot: An AnalyticsSnapshot to report on; one is built if it is not given.
     """
-    all_tasks = tasks.get_all_tasks()
-    if not all_tasks:
+    snapshot = snapshot or load_snapshot()
+    if not snapshot:
         console.print("[bold yellow]No tasks found to calculate productivity score.[/bold yellow]")
         return
 
-    total_tasks = len(all_tasks)
-    completed_tasks = [task for task in all_tasks if task['status'] == 'Completed']
-    completion_rate = (len(completed_tasks) / total_tasks) * 100 if total_tasks > 0 else 0
-
-    overdue_tasks = [
-        task for task in all_tasks 
-        if task['deadline'] and datetime.strptime(task['deadline'], "%Y-%m-%d").date() < datetime.now().date() and task['status'] != 'Completed'
-    ]
-    overdue_penalty = len(overdue_tasks) * 5 # Penalize 5 points for each overdue task
-
-    # Calculate task freshness (average completion time in days)
-    total_completion_days = 0
-    for task in completed_tasks:
-        created_date = datetime.strptime(task['created_at'], "%Y-%m-%d").date()
-        # Assuming 'completed_at' is added when a task is completed. If not, this will need adjustment.
-        completed_at_str = task.get('completed_at', task.get('created_at')) # Fallback to created_at
-        completed_date = datetime.strptime(completed_at_str, "%Y-%m-%d").date()
-        completion_days = (completed_date - created_date).days
-        total_completion_days += completion_days
-    
-    avg_completion_time = (total_completion_days / len(completed_tasks)) if completed_tasks else 0
-    
-    # Normalize avg_completion_time to a score component (e.g., less time is better)
-    freshness_score = max(0, 10 - avg_completion_time) * 2 # Scale to be a significant part of the score
+    overdue_penalty = len(snapshot.overdue) * 5 # Penalize 5 points for each overdue task
+
+    # Normalize the average completion time to a score component (e.g., less time is better)
+    freshness_score = max(0, 10 - snapshot.average_completion_days) * 2 # Scale to be a significant part of the score
 
     # Calculate final score
-    productivity_score = (completion_rate * 0.5) + freshness_score - overdue_penalty
+    productivity_score = (snapshot.completion_rate * 0.5) + freshness_score - overdue_penalty
     productivity_score = max(0, min(100, productivity_score)) # Clamp score between 0 and 100
 
     console.print("\n[bold blue]Productivity Score[/bold blue]")
@@ -210,6 +248,17 @@ def display_productivity_score():
     else:
         console.print("[green]You are a productivity master![/green]")
 
+def display_report():
+    """
+    This function displays every CLI report from a single load and scan of the tasks.
+    """
+    snapshot = load_snapshot()
+    display_productivity_analytics()
+    display_daily_weekly_summaries(snapshot)
+    display_priority_distribution_chart(snapshot)
+    display_productivity_score(snapshot)
+    reminders.display_smart_alerts(snapshot)
+    reminders.display_suggestion_engine(snapshot)
+
 if __name__ == '__main__':
-    display_priority_distribution_chart()
-    display_productivity_score()
+    display_report()
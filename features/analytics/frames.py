@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+
+def _completion_source(task):
+    # Mirrors compute_advanced_analytics(): completed_at, else the end of the last time entry
+    if task.get("status") != "Completed":
+        return None
+    if task.get("completed_at") and "T" in task["completed_at"]:
+        return task["completed_at"]
+    if task.get("time_entries") and task["time_entries"][-1]["end_time"]:
+        return task["time_entries"][-1]["end_time"]
+    return None
+
+
+class AnalyticsFrames:
+    """
+    Columnar copy of the tasks for vectorised analytics.
+
+    The tasks and their finished time entries are flattened once into two DataFrames
+    with parsed datetime64 columns; every metric after that is a groupby or bincount
+    over whole columns. The results are the same dicts the loop-based functions in
+    analytics.py return.
+
+    Attributes:
+        tasks: One row per task with status, priority, category and completion_time.
+        entries: One row per finished time entry with task (the task's row), start and end.
+    """
+
+    def __init__(self, tasks, entries):
+        self.tasks = tasks
+        self.entries = entries
+
+    @classmethod
+    def from_tasks(cls, all_tasks):
+        """
+        Builds the frames from task dicts or read-only task views.
+        """
+        statuses, priorities, categories, completions = [], [], [], []
+        entry_tasks, starts, ends = [], [], []
+        for row, task in enumerate(all_tasks):
+            statuses.append(task.get("status"))
+            priorities.append(task.get("priority", "Unknown"))
+            categories.append(task.get("category", "Unknown"))
+            completions.append(_completion_source(task))
+            for entry in task.get("time_entries") or ():
+                if entry["end_time"]:
+                    entry_tasks.append(row)
+                    starts.append(entry["start_time"])
+                    ends.append(entry["end_time"])
+
+        tasks = pd.DataFrame({
+            "status": pd.Series(statuses, dtype=object),
+            "priority": pd.Series(priorities, dtype=object),
+            "category": pd.Series(categories, dtype=object),
+            "completion_time": pd.to_datetime(pd.Series(completions, dtype=object), format="ISO8601"),
+        })
+        entries = pd.DataFrame({
+            "task": np.asarray(entry_tasks, dtype=np.int64),
+            "start": pd.to_datetime(pd.Series(starts, dtype=object), format="ISO8601"),
+            "end": pd.to_datetime(pd.Series(ends, dtype=object), format="ISO8601"),
+        })
+        return cls(tasks, entries)
+
+    @staticmethod
+    def _to_dict(series):
+        # Groups of missing values (kept with dropna=False) come back keyed NaN; the loops key them None.
+        keys = [None if pd.isna(key) else key for key in series.index.tolist()]
+        return dict(zip(keys, series.tolist()))
+
+    def productivity_analytics(self):
+        """
+        Returns the same dict as analytics.compute_productivity_analytics(), or None if there are no tasks.
+        """
+        total_tasks = len(self.tasks)
+        if not total_tasks:
+            return None
+        completed_tasks = int((self.tasks["status"] == "Completed").sum())
+        return {
+            "total_tasks": total_tasks,
+            "completed_tasks": completed_tasks,
+            "completion_rate": (completed_tasks / total_tasks) * 100,
+            "tasks_by_priority": self._to_dict(self.tasks.groupby("priority", sort=False, dropna=False).size()),
+            "tasks_by_category": self._to_dict(self.tasks.groupby("category", sort=False, dropna=False).size()),
+        }
+
+    def advanced_analytics(self):
+        """
+        Returns the same dict as analytics.compute_advanced_analytics(), or None if there are no tasks.
+        """
+        if not len(self.tasks):
+            return None
+
+        seconds = (self.entries["end"] - self.entries["start"]).dt.total_seconds().to_numpy()
+        seconds_by_task = np.bincount(self.entries["task"].to_numpy(), weights=seconds, minlength=len(self.tasks))
+        tracked = self.tasks.assign(hours=seconds_by_task / 3600)[seconds_by_task > 0]
+
+        completion_times = self.tasks["completion_time"].dropna()
+        by_day = np.bincount(completion_times.dt.weekday.to_numpy(), minlength=7)
+        by_hour = np.bincount(completion_times.dt.hour.to_numpy(), minlength=24)
+
+        return {
+            "time_by_category": self._to_dict(tracked.groupby("category", sort=False, dropna=False)["hours"].sum()),
+            "time_by_priority": self._to_dict(tracked.groupby("priority", sort=False, dropna=False)["hours"].sum()),
+            "tasks_completed_by_day": dict(enumerate(by_day.tolist())),
+            "tasks_completed_by_hour": dict(enumerate(by_hour.tolist())),
+        }
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+from features.tasks import tasks
+from features.tasks.records import Task
+
+
+class AnalyticsSnapshot:
+    """
+    Everything the CLI reports need from the whole task list, computed in one pass.
+
+    The tasks' dates come pre-parsed on their Task records, and the counts, completion
+    times and buckets used by the summaries, charts, score, alerts and suggestions are
+    filled in the same loop. Tasks due in a given window are not bucketed here: they
+    come from tasks.tasks_due_between(). Build one per report and hand it to every
+    report function.
+    """
+
+    def __init__(self, all_tasks, today=None):
+        self.today = today or date.today()
+        self.tomorrow = self.today + timedelta(days=1)
+        self.start_of_week = self.today - timedelta(days=self.today.weekday()) # Monday as start of week
+        end_of_week = self.start_of_week + timedelta(days=7)
+
+        self.total_tasks = 0
+        self.completed_tasks = 0
+        self.has_pending = False
+        self.tasks_by_priority = {}
+        self.completion_days = [] # Days from creation to completion, per completed task
+
+        # Buckets of task views
+        self.completed_today = []
+        self.completed_this_week = []
+        self.overdue = []
+        self.long_pending = []
+        self.critical_open = []
+
+        for task in all_tasks:
+            self._add(Task.of(task), end_of_week)
+
+    def _add(self, task, end_of_week):
+        today = self.today
+        self.total_tasks += 1
+        priority = task.get('priority', 'Unknown')
+        self.tasks_by_priority[priority] = self.tasks_by_priority.get(priority, 0) + 1
+
+        created = task.created_date
+        deadline = task.deadline_date
+
+        if task['status'] == 'Completed':
+            self.completed_tasks += 1
+            # 'completed_at' is stamped when a task is completed; older tasks fall back to created_at.
+            completed = task.completed_time.date() if task.completed_time else created
+            self.completion_days.append((completed - created).days)
+            if completed == today:
+                self.completed_today.append(task)
+            if self.start_of_week <= completed < end_of_week:
+                self.completed_this_week.append(task)
+            return
+
+        if task['status'] == 'Pending':
+            self.has_pending = True
+            if (today - created).days > 7:
+                self.long_pending.append(task)
+
+        if priority == 'Critical':
+            self.critical_open.append(task)
+
+        if deadline and deadline < today:
+            self.overdue.append(task)
+
+    @property
+    def completion_rate(self):
+        return (self.completed_tasks / self.total_tasks) * 100 if self.total_tasks else 0
+
+    @property
+    def average_completion_days(self):
+        return sum(self.completion_days) / len(self.completion_days) if self.completion_days else 0
+
+
+def load_snapshot(owner=None):
+    """
+    Loads an owner's tasks once and builds an AnalyticsSnapshot of them, or returns None if there are no tasks.
+    """
+    all_tasks = tasks.get_task_views(owner)
+    if not all_tasks:
+        return None
+    return AnalyticsSnapshot(all_tasks)
@@ -1,73 +1,310 @@
-import json
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
+from features.storage.files import FileLock, atomic_write
+from features.storage.store import get_store, thaw
 
 USERS_FILE = "database/users.txt"
+SECRET_KEY_FILE = "database/session.key"
+# How long a session token keeps a user logged in. Tokens are bearer credentials, so
+# they are kept short-lived; logging out revokes them at once (see end_sessions()).
+SESSION_TTL_SECONDS = int(os.environ.get("TASK_MANAGER_SESSION_TTL", 12 * 3600))
+# After this many failed logins in a row, a username is refused for LOCKOUT_SECONDS.
+MAX_FAILED_LOGINS = 5
+LOCKOUT_SECONDS = 300
+# Usernames whose failures are remembered; the least recently failed are forgotten first.
+MAX_TRACKED_LOGINS = 1024
+# bcrypt cost (log2 of its rounds) for new hashes. Stored hashes with another cost are
+# rehashed on the user's next successful login.
+BCRYPT_ROUNDS = int(os.environ.get("TASK_MANAGER_BCRYPT_ROUNDS", 12))
+# Threads that run bcrypt, and how many hashes may be running or waiting for one.
+HASH_WORKERS = int(os.environ.get("TASK_MANAGER_HASH_WORKERS", os.cpu_count() or 2))
+MAX_PENDING_HASHES = int(os.environ.get("TASK_MANAGER_MAX_PENDING_HASHES", 4 * HASH_WORKERS))
+# How long a login waits for a free slot before AuthBusyError is raised.
+HASH_QUEUE_TIMEOUT_SECONDS = 5
+
+# Looked up by username in the store's in-memory mirror, which is reloaded only when
+# users.txt changes on disk.
+_store = get_store(USERS_FILE, key="username")
 
 def load_users():
     """
     Loads user data from the users.txt file.
     """
-    try:
-        with open(USERS_FILE, "r") as f:
-            users = [json.loads(line) for line in f]
-        return users
-    except FileNotFoundError:
-        return []
+    return [thaw(user) for user in _store.records()]
 
-def save_users(users):
+def get_users_version():
+    """
+    Returns a token that changes whenever the users change, to pass to save_users().
+    """
+    return _store.version()
+
+def save_users(users, expected_version=None):
     """
     Saves user data to the users.txt file.
+    If expected_version (from get_users_version()) is given and the users changed since,
+    raises ConflictError instead of overwriting the other change.
+    """
+    _store.replace_all(users, expected_version)
+
+class AuthBusyError(Exception):
+    """
+    Raised when too many password hashes are already running or queued to take another.
+    """
+
+class HashPool:
+    """
+    Runs bcrypt calls on a fixed number of worker threads instead of the Streamlit script
+    threads; bcrypt releases the GIL, so the workers hash in parallel.
+
+    At most max_pending calls may be running or queued. run() waits up to timeout for a
+    free slot and then raises AuthBusyError, so a burst of logins is turned away early
+    instead of piling up behind the workers.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=MAX_PENDING_HASHES, timeout=HASH_QUEUE_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def run(self, function, *args):
+        """
+        Runs function(*args) on a worker and waits for its result.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise AuthBusyError("Too many logins at once, please try again in a moment.")
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+_pool = HashPool()
+
+def configure_hashing(rounds=None, workers=None, max_pending=None):
     """
-    with open(USERS_FILE, "w") as f:
-        for user in users:
-            f.write(json.dumps(user) + "\n")
+    Changes the bcrypt cost for new hashes and/or replaces the hashing pool, e.g. to
+    compare settings. Arguments left as None keep their current value.
+    """
+    global BCRYPT_ROUNDS, _pool
+    if rounds is not None:
+        BCRYPT_ROUNDS = rounds
+    if workers is not None or max_pending is not None:
+        old_pool = _pool
+        workers = workers or old_pool.workers
+        _pool = HashPool(workers, max_pending or 4 * workers, old_pool.timeout)
+        old_pool.shutdown()
 
 def hash_password(password):
     """
-    Hashes a password using bcrypt.
+    Hashes a password using bcrypt with BCRYPT_ROUNDS, on the hashing pool.
+    Raises AuthBusyError if the pool is full.
     """
-    hashed_bytes = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed_bytes = _pool.run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
     return hashed_bytes.decode('utf-8')
 
 def verify_password(password, hashed_password):
     """
-    Verifies a password against a hashed password.
+    Verifies a password against a hashed password, on the hashing pool.
+    Raises AuthBusyError if the pool is full.
+    """
+    return _pool.run(bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def needs_rehash(hashed_password):
+    """
+    Checks if a stored hash was made with another cost than BCRYPT_ROUNDS.
     """
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    # A bcrypt hash reads "$2b$<cost>$<salt and digest>".
+    return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+
+def _rehash(username, old_hash, password):
+    new_hash = hash_password(password)
+
+    def replace(user):
+        # A password changed meanwhile is left alone.
+        if user['password'] != old_hash:
+            return False
+        user['password'] = new_hash
+
+    _store.update(username, replace)
 
 def register_user(username, password):
     """
     Registers a new user with a hashed password.
     Returns True on success, False if username already exists.
+    Raises ValueError for a blank username, which could not own any data, and
+    AuthBusyError if the hashing pool is full.
     """
-    users = load_users()
-    if any(user['username'] == username for user in users):
+    if not username or not username.strip():
+        raise ValueError("Please enter a username.")
+    if _store.get(username) is not None:
         return False
     
     hashed_password = hash_password(password)
     new_user = {"username": username, "password": hashed_password}
-    users.append(new_user)
-    save_users(users)
+    with _store.exclusive():
+        # Checked again under the lock: another session may have taken the name meanwhile.
+        if _store.get(username) is not None:
+            return False
+        _store.upsert(new_user)
     return True
 
 def authenticate_user(username, password):
     """
     Authenticates a user.
-    Returns True on successful authentication, False otherwise.
+    Returns True on successful authentication, False otherwise, including while the
+    username is locked out after too many failures (see login_retry_after()).
+    A stored hash with an outdated cost is replaced by one with BCRYPT_ROUNDS.
+    Raises AuthBusyError if the hashing pool is full.
     """
-    users = load_users()
-    for user in users:
-        if user['username'] == username:
-            if verify_password(password, user['password']):
-                return True
-            else:
-                return False # Incorrect password
-    return False # User not found
+    now = time.time()
+    if _throttle.retry_after(username, now):
+        return False
+    user = _store.get(username)
+    if user is None or not verify_password(password, user['password']):
+        _throttle.record_failure(username, now)
+        return False
+    _throttle.clear(username)
+    if needs_rehash(user['password']):
+        try:
+            _rehash(username, user['password'], password)
+        except AuthBusyError:
+            pass # The login stands; the hash is upgraded on a later one.
+    return True
 
 def user_exists(username):
     """
     Checks if a user with the given username already exists.
     """
-    users = load_users()
-    return any(user['username'] == username for user in users)
+    return _store.get(username) is not None
+
+class _LoginThrottle:
+    """
+    Counts failed logins per username in a bounded LRU, so a username that keeps failing
+    is refused without a bcrypt check and the memory used stays fixed.
+    """
+
+    def __init__(self, max_failures, lockout_seconds, capacity):
+        self.max_failures = max_failures
+        self.lockout_seconds = lockout_seconds
+        self.capacity = capacity
+        self._failures = OrderedDict() # username -> (count, time of the last failure)
+        self._lock = threading.Lock()
+
+    def retry_after(self, username, now):
+        with self._lock:
+            count, last_failure = self._failures.get(username, (0, 0))
+            if count < self.max_failures:
+                return 0
+            remaining = last_failure + self.lockout_seconds - now
+            if remaining <= 0:
+                # The lockout is over: the next attempts start counting from zero again.
+                del self._failures[username]
+                return 0
+            return remaining
+
+    def record_failure(self, username, now):
+        with self._lock:
+            count, _ = self._failures.pop(username, (0, 0))
+            self._failures[username] = (count + 1, now)
+            while len(self._failures) > self.capacity:
+                self._failures.popitem(last=False)
+
+    def clear(self, username):
+        with self._lock:
+            self._failures.pop(username, None)
+
+_throttle = _LoginThrottle(MAX_FAILED_LOGINS, LOCKOUT_SECONDS, MAX_TRACKED_LOGINS)
+
+def login_retry_after(username):
+    """
+    Returns the seconds until a username that failed too many logins may try again, or 0.
+    """
+    return _throttle.retry_after(username, time.time())
+
+_key_lock = threading.Lock()
+_key = None
+
+def _secret_key():
+    """
+    Returns the key session tokens are signed with: TASK_MANAGER_SECRET_KEY if set, or a
+    random key kept in database/session.key, created on first use and shared by every
+    process of the app.
+    """
+    global _key
+    if _key is not None:
+        return _key
+    key = os.environ.get("TASK_MANAGER_SECRET_KEY")
+    with _key_lock, FileLock(SECRET_KEY_FILE + ".lock"):
+        if key is None:
+            try:
+                with open(SECRET_KEY_FILE) as f:
+                    key = f.read().strip()
+            except FileNotFoundError:
+                key = secrets.token_hex(32)
+                atomic_write(SECRET_KEY_FILE, key)
+                os.chmod(SECRET_KEY_FILE, 0o600)
+        _key = key.encode('utf-8')
+    return _key
+
+def _sign(username, expires, user):
+    # The user's session nonce is signed too, so rotating it revokes every token issued
+    # before; so is the password hash, so a new password does the same.
+    message = f"{username}\n{expires}\n{user.get('session_nonce', '')}\n{user['password']}".encode('utf-8')
+    return hmac.new(_secret_key(), message, hashlib.sha256).hexdigest()
+
+def create_session_token(username):
+    """
+    Creates a signed token that identifies a logged-in user for SESSION_TTL_SECONDS.
+    Returns None if the user does not exist.
+    """
+    user = _store.get(username)
+    if user is None:
+        return None
+    expires = int(time.time()) + SESSION_TTL_SECONDS
+    encoded_name = base64.urlsafe_b64encode(username.encode('utf-8')).decode('ascii')
+    return f"{encoded_name}.{expires}.{_sign(username, expires, user)}"
+
+def verify_session_token(token):
+    """
+    Checks a token from create_session_token() with an HMAC instead of bcrypt.
+    Returns the username it was issued to, or None if it is malformed, expired, forged,
+    revoked by end_sessions(), or the user has since been removed or changed their password.
+    """
+    try:
+        encoded_name, expires, signature = token.split(".")
+        username = base64.urlsafe_b64decode(encoded_name.encode('ascii')).decode('utf-8')
+        expires = int(expires)
+    except (AttributeError, ValueError):
+        return None
+    if expires < time.time():
+        return None
+    user = _store.get(username)
+    if user is None or not hmac.compare_digest(signature, _sign(username, expires, user)):
+        return None
+    return username
+
+def end_sessions(username):
+    """
+    Revokes every session token issued to a user, e.g. on logout, by rotating the
+    session nonce stored with the user.
+    """
+    def rotate(user):
+        user['session_nonce'] = secrets.token_hex(16)
+
+    _store.update(username, rotate)
 
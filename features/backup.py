@@ -1,16 +1,18 @@
+import glob
 import os
 import zipfile
 from datetime import datetime
 from rich.console import Console
+from features.storage.partitions import list_owners, owner_path
 
 console = Console()
 BACKUP_DIR = "backups"
-FILES_TO_BACKUP = ["database/tasks.txt", "database/reminders.txt", "database/categories.txt"]
+FILES_TO_BACKUP = ["database/tasks.txt", "database/reminders.txt", "database/categories.txt", "database/task_manager.db"]
 MAX_BACKUPS = 10
 
 def create_backup():
     """
-    Creates a timestamped backup of the database files and manages old backups.
+    Creates a timestamped backup of the database files, including every user's shard, and manages old backups.
     """
     if not os.path.exists(BACKUP_DIR):
         os.makedirs(BACKUP_DIR)
@@ -20,9 +22,13 @@ def create_backup():
 
     try:
         with zipfile.ZipFile(backup_filename, 'w') as zf:
-            for file in FILES_TO_BACKUP:
-                if os.path.exists(file):
-                    zf.write(file, os.path.basename(file))
+            files = list(FILES_TO_BACKUP)
+            for owner in list_owners():
+                files.extend(owner_path(file, owner) for file in FILES_TO_BACKUP)
+            for file in files:
+                # Include the companion journal and ID sequence files (e.g. tasks.journal, tasks.seq)
+                for path in sorted(glob.glob(os.path.splitext(file)[0] + ".*")):
+                    zf.write(path, os.path.relpath(path, "database"))
         
         console.print(f"[bold green]Backup created successfully: {backup_filename}[/bold green]")
         
@@ -1,57 +1,61 @@
 import questionary
 from rich.console import Console
 from rich.table import Table
-import json
 from features.tasks import tasks
+from features.storage.store import get_store, thaw
 
 console = Console()
 CATEGORIES_FILE = "database/categories.txt"
 
-def get_all_categories():
+
+def _category_store(owner=None):
+    # Categories are kept per owner like the tasks (see tasks.py); owner None is the shared data.
+    return get_store(CATEGORIES_FILE, owner=owner)
+
+def get_all_categories(owner=None):
     """
     This function retrieves all categories from the database file.
     
     Returns:
         A list of category dictionaries.
     """
-    try:
-        with open(CATEGORIES_FILE, "r") as f:
-            categories = [json.loads(line) for line in f]
-        return categories
-    except FileNotFoundError:
-        return []
+    return [thaw(category) for category in _category_store(owner).records()]
+
+def get_categories_version(owner=None):
+    """
+    This function returns a token that changes whenever the categories change, to pass to save_categories().
+    """
+    return _category_store(owner).version()
 
-def save_categories(categories):
+def save_categories(categories, expected_version=None, owner=None):
     """
     This function saves a list of categories to the database file.
     
     Args:
         categories: A list of category dictionaries.
+        expected_version: The get_categories_version() the list was read at. If the
+            categories changed since, ConflictError is raised and nothing is written.
     """
-    with open(CATEGORIES_FILE, "w") as f:
-        for category in categories:
-            f.write(json.dumps(category) + "\n")
+    _category_store(owner).replace_all(categories, expected_version)
 
-def create_category_data(category_name):
+def create_category_data(category_name, owner=None):
     """
     This function creates a new category.
     """
     if not category_name:
         return None, "Category name is required."
 
-    categories = get_all_categories()
-    
-    for category in categories:
-        if category['name'].lower() == category_name.lower():
+    store = _category_store(owner)
+    with store.exclusive():
+        if store.find("name", category_name, ignore_case=True):
             return None, "Category already exists."
 
-    new_category = {
-        "id": len(categories) + 1,
-        "name": category_name,
-    }
+        new_category = {
+            "id": store.next_id(),
+            "name": category_name,
+        }
 
-    categories.append(new_category)
-    save_categories(categories)
+        store.upsert(new_category)
     return new_category, "Category created successfully."
 
 def create_category():
@@ -95,8 +99,6 @@ def category_summary():
         console.print("[bold yellow]No categories found.[/bold yellow]")
         return
 
-    all_tasks = tasks.get_all_tasks()
-
     table = Table(title="Category Summary")
     table.add_column("Category", style="cyan")
     table.add_column("Total Tasks", style="magenta")
@@ -104,9 +106,8 @@ def category_summary():
     table.add_column("Pending Tasks", style="yellow")
 
     for category in categories:
-        category_tasks = [task for task in all_tasks if task['category'] == category['name']]
-        total_tasks = len(category_tasks)
-        completed_tasks = len([task for task in category_tasks if task['status'] == 'Completed'])
+        total_tasks = tasks.count_tasks(category=category['name'])
+        completed_tasks = tasks.count_tasks(category=category['name'], status='Completed')
         pending_tasks = total_tasks - completed_tasks
         table.add_row(
             category["name"],
@@ -122,20 +123,15 @@ def tag_insights():
     """
     This function displays insights about the most used tags.
     """
-    all_tasks = tasks.get_all_tasks()
-    if not all_tasks:
+    if not tasks.get_task_views():
         console.print("[bold yellow]No tasks found to generate tag insights.[/bold yellow]")
         return
 
-    all_tags = []
-    for task in all_tasks:
-        all_tags.extend(task.get('tags', []))
-
-    if not all_tags:
+    tag_counts = Counter(tasks.count_tasks_by('tags'))
+    if not tag_counts:
         console.print("[bold yellow]No tags found in tasks.[/bold yellow]")
         return
 
-    tag_counts = Counter(tag.lower() for tag in all_tags)
     most_common_tags = tag_counts.most_common()
 
     table = Table(title="Tag Insights (Most Used Tags)")
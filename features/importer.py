@@ -1,6 +1,7 @@
 import questionary
 from rich.console import Console
 import csv
+from features.storage.store import ConflictError
 from features.tasks import tasks
 from features.reminders import reminders
 
@@ -18,6 +19,7 @@ def import_tasks_from_csv():
     try:
         with open(file_name, 'r', newline='', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
+            version = tasks.get_tasks_version()
             all_tasks = tasks.get_all_tasks()
             existing_titles = {task['title'] for task in all_tasks}
             imported_count = 0
@@ -26,16 +28,18 @@ def import_tasks_from_csv():
                 if row['title'] not in existing_titles:
                     # Convert tags string back to list
                     row['tags'] = row['tags'].split(',') if row['tags'] else []
-                    row['id'] = len(all_tasks) + 1
+                    row['id'] = tasks.get_next_task_id()
                     all_tasks.append(row)
                     existing_titles.add(row['title'])
                     imported_count += 1
             
-            tasks.save_tasks(all_tasks)
+            tasks.save_tasks(all_tasks, version)
             console.print(f"[bold green]Successfully imported {imported_count} new tasks from {file_name}[/bold green]")
 
     except FileNotFoundError:
         console.print(f"[bold red]File not found: {file_name}[/bold red]")
+    except ConflictError:
+        console.print("[bold red]Tasks were changed while importing. Nothing was imported; please try again.[/bold red]")
     except Exception as e:
         console.print(f"[bold red]Error importing tasks from CSV: {e}[/bold red]")
 
@@ -51,22 +55,25 @@ def import_reminders_from_csv():
     try:
         with open(file_name, 'r', newline='', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
+            version = reminders.get_reminders_version()
             all_reminders = reminders.get_all_reminders()
             existing_messages = {rem['message'] for rem in all_reminders}
             imported_count = 0
 
             for row in reader:
                 if row['message'] not in existing_messages:
-                    row['id'] = len(all_reminders) + 1
+                    row['id'] = reminders.get_next_reminder_id()
                     all_reminders.append(row)
                     existing_messages.add(row['message'])
                     imported_count += 1
             
-            reminders.save_reminders(all_reminders)
+            reminders.save_reminders(all_reminders, version)
             console.print(f"[bold green]Successfully imported {imported_count} new reminders from {file_name}[/bold green]")
 
     except FileNotFoundError:
         console.print(f"[bold red]File not found: {file_name}[/bold red]")
+    except ConflictError:
+        console.print("[bold red]Reminders were changed while importing. Nothing was imported; please try again.[/bold red]")
     except Exception as e:
         console.print(f"[bold red]Error importing reminders from CSV: {e}[/bold red]")
 
@@ -1,52 +1,197 @@
-import json
+import threading
+import time
 import questionary
 from rich.console import Console
+from rich.table import Table
+from features.analytics.snapshot import load_snapshot
+from features.reminders.rules import DEFAULT_DEADLINE_RULES, DeadlineReminderEngine
+from features.reminders.scheduler import REMIND_AT_FORMAT, ConsoleSink, ReminderScheduler
+from features.storage.indexes import SecondaryIndex
+from features.storage.partitions import PerOwner, list_owners
+from features.storage.store import get_store, thaw
 from features.tasks import tasks
 from datetime import datetime, timedelta
 
 console = Console()
 DATABASE_FILE = "database/reminders.txt"
+# How often start_reminder_schedulers() looks for users who got data of their own since.
+OWNER_SCAN_SECONDS = 30
 
-def get_all_reminders():
+
+class _ReminderData:
+    """
+    One owner's reminder store with its index and deadline reminder engine.
+    """
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.store = get_store(DATABASE_FILE, owner=owner)
+        # "YYYY-MM-DD HH:MM" strings sort in time order, so remind_at is indexed as stored.
+        self.index = SecondaryIndex(self.store, fields=("task_id",), sorted_fields=("remind_at",))
+        self._deadline_reminders = None
+        self._lock = threading.Lock()
+
+    def deadline_reminders(self):
+        # Created on first use rather than with the rest: the engine loads the owner's
+        # tasks, which only a process that opens them needs.
+        with self._lock:
+            if self._deadline_reminders is None:
+                self._deadline_reminders = DeadlineReminderEngine(tasks.get_task_store(self.owner), self.store, self.index, DEFAULT_DEADLINE_RULES)
+            return self._deadline_reminders
+
+# Like the tasks, reminders are kept per owner (see tasks.py); owner None is the shared data.
+_partitions = PerOwner(_ReminderData)
+# Every owner whose tasks this process opens gets a deadline reminder engine listening to them.
+tasks.on_tasks_opened(lambda owner: _partitions(owner).deadline_reminders())
+
+def get_all_reminders(owner=None):
     """
     This function retrieves all reminders from the database file.
     
     Returns:
         A list of reminder dictionaries.
     """
-    try:
-        with open(DATABASE_FILE, "r") as f:
-            reminders = [json.loads(line) for line in f]
-        return reminders
-    except FileNotFoundError:
-        return []
+    return [thaw(reminder) for reminder in _partitions(owner).store.records()]
+
+def _remind_at_key(value):
+    return value.strftime(REMIND_AT_FORMAT) if isinstance(value, datetime) else value
+
+def reminders_between(start=None, end=None, owner=None):
+    """
+    This function retrieves the reminders due between start and end, using the sorted
+    remind_at index instead of reading every reminder.
+
+    Args:
+        start, end: Inclusive bounds, as datetimes or "YYYY-MM-DD HH:MM" strings. None leaves that side open.
+
+    Returns:
+        A list of read-only reminder mappings, earliest first.
+    """
+    data = _partitions(owner)
+    reminder_ids = data.index.ordered("remind_at", _remind_at_key(start), _remind_at_key(end))
+    reminders_by_id = {reminder["id"]: reminder for reminder in data.store.get_many(reminder_ids)}
+    return [reminders_by_id[reminder_id] for reminder_id in reminder_ids if reminder_id in reminders_by_id]
+
+def reminders_for_task(task_id, owner=None):
+    """
+    This function retrieves the reminders linked to a task, using the reminder index on task_id.
+
+    Returns:
+        A list of read-only reminder mappings, earliest first.
+    """
+    data = _partitions(owner)
+    reminders = data.store.get_many(data.index.keys("task_id", task_id))
+    return sorted(reminders, key=lambda reminder: reminder["remind_at"])
+
+def sync_deadline_reminders(owner=None):
+    """
+    This function creates, moves or cancels the reminders generated by the deadline rules
+    for every task, e.g. after the rules change. Edits to tasks keep them in step by themselves.
 
-def save_reminders(reminders):
+    Returns:
+        The number of reminders created, changed or cancelled.
+    """
+    return _partitions(owner).deadline_reminders().sync_all()
+
+def get_reminders_version(owner=None):
+    """
+    This function returns a token that changes whenever the reminders change, to pass to save_reminders().
+    """
+    return _partitions(owner).store.version()
+
+def save_reminders(reminders, expected_version=None, owner=None):
     """
     This function saves a list of reminders to the database file.
     
     Args:
         reminders: A list of reminder dictionaries.
+        expected_version: The get_reminders_version() the list was read at. If the
+            reminders changed since, ConflictError is raised and nothing is written.
     """
-    with open(DATABASE_FILE, "w") as f:
-        for reminder in reminders:
-            f.write(json.dumps(reminder) + "\n")
+    _partitions(owner).store.replace_all(reminders, expected_version)
 
-def add_reminder_data(message, remind_at):
+def get_next_reminder_id(owner=None):
     """
-    This function adds a new reminder to the database.
+    This function allocates a new reminder ID from the reminder store's persisted sequence.
+    """
+    return _partitions(owner).store.next_id()
+
+def add_reminder_data(message, remind_at, task_id=None, owner=None):
+    """
+    This function adds a new reminder to the database, optionally linked to a task.
     """
-    reminders = get_all_reminders()
     new_reminder = {
-        "id": len(reminders) + 1,
+        "id": get_next_reminder_id(owner),
         "message": message,
         "remind_at": remind_at.strftime("%Y-%m-%d %H:%M"),
         "created_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "fired_at": None,
+        "task_id": task_id,
     }
-    reminders.append(new_reminder)
-    save_reminders(reminders)
+    _partitions(owner).store.upsert(new_reminder)
     return new_reminder
 
+_scheduler = None
+_scheduled_owners = set()
+_scheduler_lock = threading.Lock()
+
+def start_reminder_scheduler(sinks=None, owner=None):
+    """
+    This function starts the background service that fires due reminders, and has it fire an owner's.
+
+    A process runs one scheduler, whose single thread serves every owner added to it;
+    later calls add their owner to it and return it.
+
+    Args:
+        sinks: Callables that receive each due reminder (see features/reminders/scheduler.py).
+            Defaults to printing reminders to the console. Only the first call's sinks are used.
+        owner: Whose reminders to fire, or None for the shared reminders.
+
+    Returns:
+        The running ReminderScheduler.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReminderScheduler(sinks=sinks or [ConsoleSink()]).start()
+        if owner not in _scheduled_owners:
+            # The store is enough to fire reminders; the owner's partition would also build
+            # the index and load the tasks for nothing.
+            _scheduler.add_store(get_store(DATABASE_FILE, owner=owner))
+            _scheduled_owners.add(owner)
+        return _scheduler
+
+def start_reminder_schedulers(sinks=None):
+    """
+    This function starts the reminder scheduler for the shared reminders and those of
+    every user with data of their own. A background thread checks every OWNER_SCAN_SECONDS
+    for users who got data since, e.g. on their first login, and adds theirs too.
+
+    Reminders should be fired by one process only, so the app's main.py (or
+    tools/run_reminder_scheduler.py) calls this, not the dashboard.
+
+    Returns:
+        The running ReminderScheduler.
+    """
+    sinks = sinks or [ConsoleSink()]
+
+    def scan():
+        for owner in [None, *list_owners()]:
+            scheduler = start_reminder_scheduler(sinks, owner)
+        return scheduler
+
+    def rescan():
+        while True:
+            time.sleep(OWNER_SCAN_SECONDS)
+            try:
+                scan()
+            except Exception as e:
+                console.print(f"[bold red]Could not schedule the reminders of new users: {e}[/bold red]")
+
+    scheduler = scan()
+    threading.Thread(target=rescan, name="reminder-owner-scan", daemon=True).start()
+    return scheduler
+
 def add_reminder():
     """
     This function prompts the user for reminder details and adds the reminder to the database.
@@ -68,8 +213,16 @@ def add_reminder():
     else:
         console.print("[bold red]Reminder datetime is required.[/bold red]")
         return
+
+    task_id_str = questionary.text("Which task is the reminder for (task ID, leave empty for none)?").ask()
+    task_id = None
+    if task_id_str:
+        if not task_id_str.isdigit() or tasks.get_task_by_id(int(task_id_str)) is None:
+            console.print("[bold red]Task not found.[/bold red]")
+            return
+        task_id = int(task_id_str)
     
-    add_reminder_data(message, reminder_datetime)
+    add_reminder_data(message, reminder_datetime, task_id)
     console.print(f"[bold green]Reminder '{message}' added successfully![/bold green]")
 
 def list_reminders():
@@ -86,6 +239,7 @@ def list_reminders():
     table.add_column("Message", style="magenta")
     table.add_column("Remind At", style="yellow")
     table.add_column("Created At", style="blue")
+    table.add_column("Task", style="green")
 
     for reminder in reminders:
         table.add_row(
@@ -93,35 +247,39 @@ def list_reminders():
             reminder["message"],
             reminder["remind_at"],
             reminder["created_at"],
+            str(reminder["task_id"]) if reminder.get("task_id") is not None else "",
         )
 
     console.print(table)
 
-def edit_reminder_data(reminder_id, message, remind_at):
+def get_reminder_by_id(reminder_id, owner=None):
+    """
+    This function retrieves a reminder by its ID using the reminder store's ID index.
+    """
+    reminder = _partitions(owner).store.get(reminder_id)
+    return thaw(reminder) if reminder is not None else None
+
+def edit_reminder_data(reminder_id, message, remind_at, owner=None):
     """
     This function edits an existing reminder's data.
     """
-    reminders = get_all_reminders()
-    reminder_to_edit = None
-    for reminder in reminders:
-        if reminder["id"] == reminder_id:
-            reminder_to_edit = reminder
-            break
-    
-    if not reminder_to_edit:
-        return None
+    new_remind_at = remind_at.strftime("%Y-%m-%d %H:%M")
 
-    reminder_to_edit["message"] = message
-    reminder_to_edit["remind_at"] = remind_at.strftime("%Y-%m-%d %H:%M")
-    save_reminders(reminders)
-    return reminder_to_edit
+    def edit(reminder):
+        if new_remind_at != reminder["remind_at"]:
+            reminder["fired_at"] = None # Fire again at the new time
+        reminder["message"] = message
+        reminder["remind_at"] = new_remind_at
+
+    # Read and written under the store lock, so a fired_at stamped by the scheduler
+    # in between is not overwritten.
+    return _partitions(owner).store.update(reminder_id, edit)
 
 def edit_reminder():
     """
     This function edits an existing reminder.
     """
-    reminders = get_all_reminders()
-    if not reminders:
+    if not _partitions().store.records():
         console.print("[bold yellow]No reminders to edit.[/bold yellow]")
         return
 
@@ -133,11 +291,7 @@ def edit_reminder():
         return
 
     reminder_id = int(reminder_id_str)
-    reminder_to_edit = None
-    for reminder in reminders:
-        if reminder["id"] == reminder_id:
-            reminder_to_edit = reminder
-            break
+    reminder_to_edit = get_reminder_by_id(reminder_id)
 
     if not reminder_to_edit:
         console.print("[bold red]Reminder not found.[/bold red]")
@@ -160,30 +314,22 @@ def edit_reminder():
     edit_reminder_data(reminder_id, message, reminder_datetime)
     console.print(f"[bold green]Reminder '{message}' updated successfully![/bold green]")
 
-def delete_reminder_data(reminder_id):
+def delete_reminder_data(reminder_id, owner=None):
     """
     This function deletes a reminder by its ID.
     """
-    reminders = get_all_reminders()
-    reminder_to_delete = None
-    for reminder in reminders:
-        if reminder["id"] == reminder_id:
-            reminder_to_delete = reminder
-            break
-    
-    if not reminder_to_delete:
+    store = _partitions(owner).store
+    if store.get(reminder_id) is None:
         return False
     
-    reminders.remove(reminder_to_delete)
-    save_reminders(reminders)
+    store.delete(reminder_id)
     return True
 
 def delete_reminder():
     """
     This function deletes a reminder.
     """
-    reminders = get_all_reminders()
-    if not reminders:
+    if not _partitions().store.records():
         console.print("[bold yellow]No reminders to delete.[/bold yellow]")
         return
 
@@ -195,11 +341,7 @@ def delete_reminder():
         return
 
     reminder_id = int(reminder_id_str)
-    reminder_to_delete = None
-    for reminder in reminders:
-        if reminder["id"] == reminder_id:
-            reminder_to_delete = reminder
-            break
+    reminder_to_delete = get_reminder_by_id(reminder_id)
 
     if not reminder_to_delete:
         console.print("[bold red]Reminder not found.[/bold red]")
@@ -213,25 +355,32 @@ def delete_reminder():
         else:
             console.print(f"[bold red]Failed to delete reminder '{reminder_to_delete['message']}'.[/bold red]")
 
-def display_smart_alerts():
+def display_smart_alerts(snapshot=None, owner=None):
     """
-    This function displays smart alerts for tasks.
+    This function displays smart alerts for tasks and reminders.
+
+    The deadline and reminder alerts are time-range queries on the sorted indexes.
+
+    Args:
+        snapshot: An AnalyticsSnapshot to report on; one is built if it is not given.
+        owner: Whose tasks and reminders to report on, or None for the shared data.
     """
-    all_tasks = tasks.get_all_tasks()
-    if not all_tasks:
+    snapshot = snapshot or load_snapshot(owner)
+    if not snapshot:
         console.print("[bold yellow]No tasks found for smart alerts.[/bold yellow]")
         return
 
-    today = datetime.now().date()
-    tomorrow = today + timedelta(days=1)
-    
     console.print("\n[bold blue]Smart Alerts[/bold blue]")
 
-    # Deadline Alerts
-    due_today = [task for task in all_tasks if task['deadline'] and datetime.strptime(task['deadline'], "%Y-%m-%d").date() == today and task['status'] != 'Completed']
-    due_tomorrow = [task for task in all_tasks if task['deadline'] and datetime.strptime(task['deadline'], "%Y-%m-%d").date() == tomorrow and task['status'] != 'Completed']
-    overdue = [task for task in all_tasks if task['deadline'] and datetime.strptime(task['deadline'], "%Y-%m-%d").date() < today and task['status'] != 'Completed']
+    today = snapshot.today
+    now = datetime.now()
+    due_today = tasks.tasks_due_between(today, today, owner=owner)
+    due_tomorrow = tasks.tasks_due_between(snapshot.tomorrow, snapshot.tomorrow, owner=owner)
+    overdue = tasks.tasks_due_between(None, today - timedelta(days=1), owner=owner)
+    critical_due_soon = [task for task in tasks.tasks_due_between(None, today + timedelta(days=3), owner=owner) if task.get('priority') == 'Critical']
+    upcoming_reminders = reminders_between(now, now + timedelta(hours=1), owner)
 
+    # Deadline Alerts
     if due_today:
         console.print(f"[bold yellow]Tasks Due Today ({len(due_today)}):[/bold yellow]")
         for task in due_today:
@@ -247,13 +396,16 @@ def display_smart_alerts():
         for task in overdue:
             console.print(f"- {task['title']}")
 
-    # Other Smart Alerts
-    long_pending_tasks = [task for task in all_tasks if task['status'] == 'Pending' and (today - datetime.strptime(task['created_at'], "%Y-%m-%d").date()).days > 7]
-    critical_due_soon = [task for task in all_tasks if task['priority'] == 'Critical' and task['deadline'] and (datetime.strptime(task['deadline'], "%Y-%m-%d").date() - today).days <= 3 and task['status'] != 'Completed']
+    # Reminder Alerts
+    if upcoming_reminders:
+        console.print(f"[bold cyan]Reminders in the Next Hour ({len(upcoming_reminders)}):[/bold cyan]")
+        for reminder in upcoming_reminders:
+            console.print(f"- {reminder['remind_at']}: {reminder['message']}")
 
-    if long_pending_tasks:
-        console.print(f"[bold magenta]Long Pending Tasks (>7 days) ({len(long_pending_tasks)}):[/bold magenta]")
-        for task in long_pending_tasks:
+    # Other Smart Alerts
+    if snapshot.long_pending:
+        console.print(f"[bold magenta]Long Pending Tasks (>7 days) ({len(snapshot.long_pending)}):[/bold magenta]")
+        for task in snapshot.long_pending:
             console.print(f"- {task['title']}")
 
     if critical_due_soon:
@@ -261,32 +413,35 @@ def display_smart_alerts():
         for task in critical_due_soon:
             console.print(f"- {task['title']}")
 
-def display_suggestion_engine():
+def display_suggestion_engine(snapshot=None, owner=None):
     """
     This function provides suggestions based on the user's tasks.
+
+    Args:
+        snapshot: An AnalyticsSnapshot to report on; one is built if it is not given.
+        owner: Whose tasks to report on, or None for the shared tasks.
     """
-    all_tasks = tasks.get_all_tasks()
-    if not all_tasks:
+    snapshot = snapshot or load_snapshot(owner)
+    if not snapshot:
         console.print("[bold yellow]No tasks found to generate suggestions.[/bold yellow]")
         return
 
-    today = datetime.now().date()
-    overdue_tasks = [task for task in all_tasks if task['deadline'] and datetime.strptime(task['deadline'], "%Y-%m-%d").date() < today and task['status'] != 'Completed']
-    completed_today = [task for task in all_tasks if task.get('completed_at') and datetime.strptime(task['completed_at'], "%Y-%m-%d").date() == today]
-    critical_tasks = [task for task in all_tasks if task['priority'] == 'Critical' and task['status'] != 'Completed']
+    many_overdue = len(snapshot.overdue) > 3
+    nothing_done_today = not snapshot.completed_today and snapshot.has_pending
+    many_critical = len(snapshot.critical_open) > 5
 
     console.print("\n[bold blue]Suggestion Engine[/bold blue]")
 
-    if len(overdue_tasks) > 3:
+    if many_overdue:
         console.print("[bold yellow]Suggestion:[/bold yellow] You have several overdue tasks. Consider using time blocking to focus on them.")
     
-    if not completed_today and any(task['status'] == 'Pending' for task in all_tasks):
+    if nothing_done_today:
         console.print("[bold yellow]Suggestion:[/bold yellow] No tasks completed today. Try tackling a small, easy task to gain momentum.")
 
-    if len(critical_tasks) > 5:
+    if many_critical:
         console.print("[bold yellow]Suggestion:[/bold yellow] You have a high number of critical tasks. It might be helpful to re-prioritize them.")
 
-    if not any([len(overdue_tasks) > 3, not completed_today and any(task['status'] == 'Pending' for task in all_tasks), len(critical_tasks) > 5]):
+    if not any([many_overdue, nothing_done_today, many_critical]):
         console.print("[bold green]You are doing great! Keep up the good work.[/bold green]")
 
 if __name__ == '__main__':
@@ -0,0 +1,143 @@
+from datetime import datetime, time, timedelta
+from features.reminders.scheduler import REMIND_AT_FORMAT
+from features.storage.store import thaw
+from features.tasks.records import Task
+
+# Deadlines are dates; rules count back from this time on the deadline day.
+DEADLINE_TIME = time(9, 0)
+
+
+class DeadlineRule:
+    """
+    A reminder to create for every open task with a deadline that the rule applies to.
+
+    Args:
+        name: Identifies the reminders the rule created, so they can be updated or cancelled.
+        before: How long before the deadline the reminder fires, as a timedelta.
+        priorities: The task priorities the rule applies to, or None for all of them.
+        message: The reminder message; {title} and {deadline} are filled in from the task.
+    """
+
+    def __init__(self, name, before, priorities=None, message="Task '{title}' is due {deadline}."):
+        self.name = name
+        self.before = before
+        self.priorities = frozenset(priorities) if priorities is not None else None
+        self.message = message
+
+    def applies(self, task):
+        return self.priorities is None or task.get("priority") in self.priorities
+
+    def remind_at(self, deadline):
+        return datetime.combine(deadline, DEADLINE_TIME) - self.before
+
+
+DEFAULT_DEADLINE_RULES = (
+    DeadlineRule("critical-24h", timedelta(hours=24), priorities=("Critical",), message="Critical task '{title}' is due {deadline}."),
+    DeadlineRule("high-2h", timedelta(hours=2), priorities=("High",)),
+)
+
+
+class DeadlineReminderEngine:
+    """
+    Keeps rule-generated reminders in step with the tasks' deadlines.
+
+    Each generated reminder carries the task_id and the name of the rule that made it.
+    The engine listens to the task store; for every batch of task changes it works out
+    which reminders the changed tasks should have, looks up the ones they have through
+    the reminder index on task_id, and creates, moves or cancels them in one batched
+    write to the reminder store. Completed and deleted tasks, and tasks whose deadline
+    has passed, lose their generated reminders; reminders added by hand are never touched.
+    The first change after the engine is created or the tasks are reloaded wholesale
+    syncs every task instead, as sync_all() does.
+    """
+
+    def __init__(self, task_store, reminder_store, reminder_index, rules=DEFAULT_DEADLINE_RULES, clock=datetime.now):
+        self.task_store = task_store
+        self.reminder_store = reminder_store
+        self.reminder_index = reminder_index
+        self.rules = tuple(rules)
+        self.clock = clock
+        self._stale = True
+        task_store.subscribe(self._on_change)
+        # A store only reports changes once it holds the records, so load the tasks now.
+        task_store.version()
+
+    def _desired(self, task, now):
+        task = Task.of(task) if task is not None else None
+        if task is None or task.get("status") == "Completed" or not task.deadline_date:
+            return {}
+        if datetime.combine(task.deadline_date, DEADLINE_TIME) <= now:
+            return {}
+        return {
+            rule.name: (rule.remind_at(task.deadline_date).strftime(REMIND_AT_FORMAT), rule.message.format(title=task.get("title"), deadline=task["deadline"]))
+            for rule in self.rules if rule.applies(task)
+        }
+
+    def _plan(self, task_id, task, now, upserts, deletes):
+        reminder_ids = self.reminder_index.keys("task_id", task_id)
+        existing = {reminder["rule"]: reminder for reminder in self.reminder_store.get_many(reminder_ids) if reminder.get("rule")}
+        desired = self._desired(task, now)
+
+        deletes.extend(reminder["id"] for rule, reminder in existing.items() if rule not in desired)
+        for rule, (remind_at, message) in desired.items():
+            reminder = existing.get(rule)
+            if reminder is None:
+                upserts.append({
+                    "id": self.reminder_store.next_id(),
+                    "message": message,
+                    "remind_at": remind_at,
+                    "created_at": now.strftime(REMIND_AT_FORMAT),
+                    "fired_at": None,
+                    "task_id": task_id,
+                    "rule": rule,
+                })
+            elif reminder["remind_at"] != remind_at:
+                upserts.append({**thaw(reminder), "message": message, "remind_at": remind_at, "fired_at": None})
+            elif reminder["message"] != message:
+                upserts.append({**thaw(reminder), "message": message})
+
+    def _sync(self, tasks_by_id):
+        now = self.clock()
+        upserts = []
+        deletes = []
+        # batch() holds exclusive(), which picks up reminders written by other processes
+        # before comparing and keeps them from generating the same reminders at the same
+        # time, and commits the new IDs and every change together.
+        with self.reminder_store.batch():
+            for task_id, task in tasks_by_id.items():
+                self._plan(task_id, task, now, upserts, deletes)
+            self.reminder_store.apply(upserts, deletes)
+        return len(upserts) + len(deletes)
+
+    def _on_change(self, changes):
+        if changes is None:
+            # Reading the store back from inside its reload notification is not safe;
+            # the next change syncs every task instead.
+            self._stale = True
+            return
+        if self._stale:
+            self.sync_all()
+            return
+        tasks_by_id = {}
+        for old, new in changes:
+            if old is not None:
+                tasks_by_id.setdefault(old.get("id"), None)
+            if new is not None:
+                tasks_by_id[new.get("id")] = new
+        self._sync(tasks_by_id)
+
+    def sync_all(self):
+        """
+        Brings the generated reminders of every task in line with the rules, in one batched write.
+
+        Returns:
+            The number of reminders created, changed or cancelled.
+        """
+        with self.task_store.transaction():
+            tasks_by_id = {task["id"]: task for task in self.task_store.records()}
+            self._stale = False
+        # Reminders of tasks that no longer exist are cancelled too.
+        for task_id in self.reminder_index.counts("task_id"):
+            if task_id is not None:
+                tasks_by_id.setdefault(task_id, None)
+        return self._sync(tasks_by_id)
@@ -0,0 +1,275 @@
+import heapq
+import json
+import threading
+from datetime import datetime
+from rich.console import Console
+from features.storage.store import thaw
+
+console = Console()
+REMIND_AT_FORMAT = "%Y-%m-%d %H:%M"
+POLL_SECONDS = 2.0 # How often changes made by other processes are picked up
+
+
+def _remind_time(reminder):
+    # Reminders that already fired are not scheduled again until their time is edited.
+    if reminder.get("fired_at"):
+        return None
+    try:
+        return datetime.strptime(reminder["remind_at"], REMIND_AT_FORMAT)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ConsoleSink:
+    """
+    Prints each due reminder to the terminal.
+    """
+
+    def __init__(self, output=None):
+        self.output = output or console
+
+    def __call__(self, reminder):
+        self.output.print(f"[bold yellow]Reminder:[/bold yellow] {reminder['message']} (due {reminder['remind_at']})")
+
+
+class FileSink:
+    """
+    Appends each due reminder as a JSON line to a local file, for another process to tail.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, reminder):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(reminder) + "\n")
+
+
+class QueueSink:
+    """
+    Puts each due reminder on a queue.Queue, for a consumer thread in the same process.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __call__(self, reminder):
+        self.queue.put(reminder)
+
+
+class NotificationSink:
+    """
+    Stand-in for desktop notifications: hands a title and a body to notify(), which
+    prints them by default. Pass a platform notifier as notify to show real notifications.
+    """
+
+    def __init__(self, notify=None, title="Task Manager"):
+        self.notify = notify or (lambda title, body: print(f"[{title}] {body}"))
+        self.title = title
+
+    def __call__(self, reminder):
+        self.notify(self.title, reminder["message"])
+
+
+class ReminderScheduler:
+    """
+    Background service that fires reminders when their remind_at time comes.
+
+    One worker thread serves any number of reminder stores, e.g. one per user. The
+    reminders waiting in all of them share one min-heap ordered by remind_at, which is
+    kept up to date from the stores' change notifications instead of by rescanning the
+    reminders. The worker sleeps until the head of the heap is due (checking the stores
+    for changes from other processes every poll_seconds), stamps the due reminders of
+    each store with "fired_at" in one batched write and then hands each one to every
+    sink. Reminders that came due while the scheduler was not running fire when it starts.
+
+    A sink is any callable that takes the reminder dictionary, e.g. ConsoleSink,
+    FileSink, QueueSink or NotificationSink.
+    """
+
+    def __init__(self, store=None, sinks=(), poll_seconds=POLL_SECONDS, clock=datetime.now):
+        self.stores = []
+        self.sinks = list(sinks)
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+        self._heap = [] # (remind time, store slot, reminder ID); entries that no longer match _due are skipped
+        self._due = {} # (store slot, reminder ID) -> current remind time
+        self._stale = set() # Slots of the stores whose entries must be rebuilt from their records
+        # Guards the heap and wakes the worker. Lock order: a store lock, then this one.
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        if store is not None:
+            self.add_store(store)
+
+    def add_store(self, store):
+        """
+        Starts firing the reminders of another store too.
+        """
+        with self._wakeup:
+            slot = len(self.stores)
+            self.stores.append(store)
+            self._stale.add(slot)
+            self._wakeup.notify_all()
+        store.subscribe(lambda changes: self._on_change(slot, changes))
+
+    def _push(self, slot, reminder):
+        remind_time = _remind_time(reminder)
+        if remind_time is not None:
+            self._due[(slot, reminder["id"])] = remind_time
+            heapq.heappush(self._heap, (remind_time, slot, reminder["id"]))
+
+    def _on_change(self, slot, changes):
+        with self._wakeup:
+            if changes is None:
+                self._stale.add(slot)
+            elif slot not in self._stale:
+                for old, new in changes:
+                    if old is not None:
+                        self._due.pop((slot, old.get("id")), None)
+                    if new is not None:
+                        self._push(slot, new)
+            self._wakeup.notify_all() # The next reminder may now be due sooner
+
+    def _rebuild(self, slot):
+        with self._wakeup:
+            # The store's old heap entries no longer match _due, so they are skipped.
+            self._due = {entry: remind_time for entry, remind_time in self._due.items() if entry[0] != slot}
+            for reminder in self.stores[slot].records():
+                self._push(slot, reminder)
+            self._stale.discard(slot)
+
+    def _refresh(self):
+        # A store that cannot be read is reported and tried again on the next poll; the
+        # other stores' reminders still fire meanwhile.
+        with self._wakeup:
+            slots = sorted(self._stale)
+        readable = True
+        for slot in slots:
+            store = self.stores[slot]
+            try:
+                with store.transaction():
+                    self._rebuild(slot)
+            except Exception as e:
+                console.print(f"[bold red]Could not load reminders from {getattr(store, 'path', store)}: {e}[/bold red]")
+                readable = False
+        return readable
+
+    def _next_time(self):
+        while self._heap and self._due.get(self._heap[0][1:]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def next_due(self):
+        """
+        Returns the time the next reminder is due, or None if no reminder is waiting.
+        """
+        self._refresh()
+        with self._wakeup:
+            return self._next_time()
+
+    def run_due(self, now=None):
+        """
+        Fires every reminder that is due at or before now.
+
+        Returns:
+            The list of reminder dictionaries that fired.
+        """
+        self._refresh()
+        return self._fire_due(now or self.clock())
+
+    def _fire_due(self, now):
+        due_by_slot = {}
+        with self._wakeup:
+            while self._heap and self._heap[0][0] <= now:
+                remind_time, slot, reminder_id = heapq.heappop(self._heap)
+                if self._due.get((slot, reminder_id)) == remind_time:
+                    del self._due[(slot, reminder_id)]
+                    due_by_slot.setdefault(slot, []).append((reminder_id, remind_time))
+
+        # Most polls find nothing due; only stores with due reminders take their cross-process write lock.
+        fired = []
+        for slot, due in due_by_slot.items():
+            try:
+                fired.extend(self._stamp(self.stores[slot], due, now))
+            except Exception as e:
+                console.print(f"[bold red]Could not fire reminders: {e}[/bold red]")
+                with self._wakeup:
+                    self._stale.add(slot) # The rebuild puts the reminders popped above back
+
+        for reminder in fired:
+            for sink in self.sinks:
+                try:
+                    sink(reminder)
+                except Exception as e:
+                    console.print(f"[bold red]Reminder sink {type(sink).__name__} failed: {e}[/bold red]")
+        return fired
+
+    def _stamp(self, store, due, now):
+        with store.exclusive():
+            # Read again under the lock: another process may have fired or moved them meanwhile.
+            fired = []
+            for reminder_id, remind_time in due:
+                reminder = store.get(reminder_id)
+                if reminder is not None and _remind_time(reminder) == remind_time:
+                    fired.append({**thaw(reminder), "fired_at": now.strftime(REMIND_AT_FORMAT)})
+            # Stamping before dispatching means a reminder fires at most once, even across restarts.
+            store.apply(upserts=fired)
+        return fired
+
+    def _run(self):
+        while True:
+            failed = False
+            with self._wakeup:
+                stores = list(self.stores)
+            for store in stores:
+                try:
+                    store.version() # Replays changes made by other processes into the heap
+                except Exception as e:
+                    console.print(f"[bold red]Reminder scheduler error: {e}[/bold red]")
+                    failed = True
+            try:
+                failed = not self._refresh() or failed
+                self._fire_due(self.clock())
+            except Exception as e:
+                console.print(f"[bold red]Reminder scheduler error: {e}[/bold red]")
+                failed = True
+            with self._wakeup:
+                if self._stopping:
+                    return
+                if self._stale and not failed:
+                    continue # Reloaded since the refresh; rebuild the heap before sleeping
+                # Computed under the lock, so a change notified after this point still wakes the wait.
+                next_time = self._next_time()
+                timeout = self.poll_seconds
+                if next_time is not None:
+                    timeout = min(timeout, max(0.0, (next_time - self.clock()).total_seconds()))
+                self._wakeup.wait(timeout)
+                if self._stopping:
+                    return
+
+    def start(self):
+        """
+        Starts the worker thread (a daemon thread, so it does not keep the process alive).
+
+        Returns:
+            The scheduler itself.
+        """
+        with self._wakeup:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stops the worker thread and waits for it to finish.
+        """
+        with self._wakeup:
+            thread = self._thread
+            self._thread = None
+            self._stopping = True
+            self._wakeup.notify_all()
+        if thread is not None:
+            thread.join(timeout)
@@ -0,0 +1,71 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, so only threads within a process are serialised
+    fcntl = None
+
+
+def atomic_write(path, data, fsync=True):
+    """
+    Replaces the file at path with data (a str) in one step.
+
+    The data is written to a temporary file next to it, which is then renamed over the
+    old file, so readers and a crash mid-write see either the old or the new contents,
+    never a truncated file. With fsync the data reaches the disk before the rename.
+    """
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "w") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a lock file (fcntl.flock), shared by all processes that
+    open the same path.
+
+    The lock is re-entrant: nested acquires by the holder only count the depth. It does
+    not guard against threads of the same process; callers hold a threading lock around it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._depth = 0
+
+    def acquire(self):
+        if self._depth == 0 and fcntl is not None:
+            self._file = open(self.path, "a")
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._file.close()
+                self._file = None
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+
+MAX_DELAY_SECONDS = 0.002 # How long the first queued write waits for others to join its commit
+MAX_BATCH = 64 # A commit starts at once when this many writes are queued
+LATENCY_SAMPLES = 10000 # Latencies kept for the percentile in stats()
+
+
+class _Request:
+    __slots__ = ("mutation", "submitted", "done", "result", "error")
+
+    def __init__(self, mutation):
+        self.mutation = mutation
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WriteCoordinator:
+    """
+    Group commit for a store: writes submitted by many threads at once share one commit.
+
+    submit() queues a mutation (a function that writes to the store) and blocks until it
+    is durable. A worker thread takes the queue MAX_DELAY_SECONDS after the first write
+    arrived, or as soon as max_batch writes are waiting, runs the mutations one after
+    the other inside store.batch() and commits them with a single fsync. Each mutation
+    sees the writes of the ones before it; one that raises gets its exception back
+    without affecting the rest, while a failed commit is reported to every caller in it.
+
+    Mutations run on the worker thread with the store locked, so they must not submit
+    writes of their own, and submit() must not be called while holding the store lock.
+    """
+
+    def __init__(self, store, max_delay=MAX_DELAY_SECONDS, max_batch=MAX_BATCH):
+        self.store = store
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = []
+        self._wakeup = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def submit(self, mutation):
+        """
+        Runs mutation(store) in the next group commit and waits until that commit is durable.
+
+        Returns:
+            What mutation returned. An exception it raised, or one from the commit, is raised here.
+        """
+        if threading.current_thread() is self._thread:
+            return mutation(self.store) # Already inside a commit
+
+        request = _Request(mutation)
+        with self._wakeup:
+            closed = self._closed
+            if not closed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="write-coordinator", daemon=True)
+                    self._thread.start()
+                self._queue.append(request)
+                self._wakeup.notify_all()
+        if closed:
+            # Each write commits on its own, on the caller's thread.
+            with self.store.batch():
+                return mutation(self.store)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _take_batch(self):
+        with self._wakeup:
+            while not self._queue:
+                if self._closed:
+                    return None # Every write queued before close() is committed
+                self._wakeup.wait()
+            deadline = self._queue[0].submitted + self.max_delay
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._wakeup.wait(remaining)
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                with self.store.batch():
+                    for request in batch:
+                        try:
+                            request.result = request.mutation(self.store)
+                        except Exception as e:
+                            request.error = e
+            except BaseException as e:
+                for request in batch:
+                    request.error = request.error or e
+            self._record(batch)
+            for request in batch:
+                request.done.set()
+
+    def close(self):
+        """
+        Stops the worker thread once the writes already queued are committed. Writes
+        submitted afterwards, e.g. by a caller that still holds the coordinator, are
+        committed one by one without it.
+        """
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify_all()
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        with self._stats_lock:
+            self._commits += 1
+            self._operations += len(batch)
+            self._latencies.extend(now - request.submitted for request in batch)
+
+    def reset_stats(self):
+        """
+        Starts counting commits and latencies afresh.
+        """
+        with self._stats_lock:
+            self._since = time.perf_counter()
+            self._commits = 0
+            self._operations = 0
+            self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def stats(self):
+        """
+        Returns the commit statistics since the coordinator was created or reset_stats() was called.
+
+        Returns:
+            A dict with the number of commits and operations, the average operations per
+            commit, fsyncs_per_second (each commit is one fsync) and p99_latency_ms, the
+            99th percentile of the time from submit() until the write was durable.
+        """
+        with self._stats_lock:
+            elapsed = time.perf_counter() - self._since
+            latencies = sorted(self._latencies)
+            commits, operations = self._commits, self._operations
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+        return {
+            "commits": commits,
+            "operations": operations,
+            "operations_per_commit": operations / commits if commits else 0.0,
+            "fsyncs_per_second": commits / elapsed if elapsed > 0 else 0.0,
+            "p99_latency_ms": p99 * 1000,
+        }
@@ -0,0 +1,140 @@
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from operator import itemgetter
+
+
+class SecondaryIndex:
+    """
+    Secondary indexes over one store's records, kept current from its change notifications.
+
+    Three kinds of field can be indexed:
+        fields: value -> set of record keys, for exact matches.
+        tag_fields: lower-cased list item -> set of record keys, for list fields such as tags.
+        sorted_fields: a sorted list of (value, key) pairs, for range scans with bisect.
+            Empty values (None or "", e.g. a task without a deadline) are left out.
+
+    Lookups return fresh sets, so compound filters are plain set intersections. The
+    indexes are built from records() on first use and again whenever the store reloads
+    wholesale; every other change only touches the entries of the records it affects.
+    """
+
+    def __init__(self, store, fields=(), tag_fields=(), sorted_fields=()):
+        self.store = store
+        self.fields = tuple(fields)
+        self.tag_fields = tuple(tag_fields)
+        self.sorted_fields = tuple(sorted_fields)
+        self._buckets = {}
+        self._sorted = {}
+        self._stale = True
+        store.subscribe(self._on_change)
+
+    @staticmethod
+    def _tags(record, field):
+        return {str(tag).lower() for tag in record.get(field) or ()}
+
+    def _add(self, record):
+        key = record.get(self.store.key)
+        for field in self.fields:
+            value = record.get(field)
+            try:
+                self._buckets[field].setdefault(value, set()).add(key)
+            except TypeError:
+                continue # Unhashable values are not indexed
+        for field in self.tag_fields:
+            for tag in self._tags(record, field):
+                self._buckets[field].setdefault(tag, set()).add(key)
+        for field in self.sorted_fields:
+            if record.get(field):
+                insort(self._sorted[field], (record[field], key))
+
+    def _discard(self, buckets, value, key):
+        bucket = buckets.get(value)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del buckets[value]
+
+    def _remove(self, record):
+        key = record.get(self.store.key)
+        for field in self.fields:
+            try:
+                self._discard(self._buckets[field], record.get(field), key)
+            except TypeError:
+                continue
+        for field in self.tag_fields:
+            for tag in self._tags(record, field):
+                self._discard(self._buckets[field], tag, key)
+        for field in self.sorted_fields:
+            if record.get(field):
+                entries = self._sorted[field]
+                position = bisect_left(entries, (record[field], key))
+                if position < len(entries) and entries[position] == (record[field], key):
+                    del entries[position]
+
+    def _on_change(self, changes):
+        if changes is None:
+            self._stale = True
+            return
+        if self._stale:
+            return
+        for old, new in changes:
+            if old is not None:
+                self._remove(old)
+            if new is not None:
+                self._add(new)
+
+    def _rebuild(self):
+        self._buckets = {field: {} for field in self.fields + self.tag_fields}
+        self._sorted = {field: [] for field in self.sorted_fields}
+        records = self.store.records()
+        self._stale = False
+        for record in records:
+            self._add(record)
+
+    @contextmanager
+    def _current(self):
+        # store.transaction() first picks up changes made by other processes.
+        with self.store.transaction():
+            if self._stale:
+                self._rebuild()
+            yield
+
+    def keys(self, field, value, ignore_case=False):
+        """
+        Returns the keys of the records whose field equals value (or contains it, for a tag field).
+        """
+        with self._current():
+            buckets = self._buckets[field]
+            if field in self.tag_fields:
+                return set(buckets.get(str(value).lower(), ()))
+            if ignore_case:
+                value = str(value).lower()
+                return set().union(*(keys for item, keys in buckets.items() if str(item).lower() == value))
+            return set(buckets.get(value, ()))
+
+    def counts(self, field):
+        """
+        Returns a dict mapping each indexed value of field to the number of records that have it.
+        """
+        with self._current():
+            return {value: len(keys) for value, keys in self._buckets[field].items()}
+
+    def ordered(self, field, start=None, end=None):
+        """
+        Returns the keys of the records whose field lies between start and end, both
+        inclusive, as a list in order of the field.
+
+        Either bound may be None to leave that side open. Records without the field never
+        match. Finding the bounds is a binary search, so this costs O(log n + k) for k matches.
+        """
+        with self._current():
+            entries = self._sorted[field]
+            low = 0 if start is None else bisect_left(entries, start, key=itemgetter(0))
+            high = len(entries) if end is None else bisect_right(entries, end, key=itemgetter(0))
+            return [key for _, key in entries[low:high]]
+
+    def range(self, field, start=None, end=None):
+        """
+        Returns the keys of the records whose field lies between start and end (see ordered()) as a set.
+        """
+        return set(self.ordered(field, start, end))
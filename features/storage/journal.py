@@ -0,0 +1,93 @@
+import json
+import os
+from collections.abc import Mapping
+
+
+def _json_default(value):
+    # Frozen records (mapping proxies and Record instances) serialise like the dicts they came from
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(record):
+    """
+    Serialises a record (plain or frozen) to a single JSON line without the newline.
+    """
+    return json.dumps(record, default=_json_default)
+
+
+def journal_path(path):
+    """
+    Returns the journal file that belongs to a snapshot file, e.g. tasks.txt -> tasks.journal.
+    """
+    return os.path.splitext(path)[0] + ".journal"
+
+
+class Journal:
+    """
+    Append-only log of record changes kept next to a JSON-lines snapshot.
+
+    Each line is {"op": "upsert", "record": {...}}, {"op": "patch", "id": ..., "fields": {...}}
+    or {"op": "delete", "id": ...}.
+    Replaying the journal over the snapshot gives the current contents; replay is
+    idempotent, so a journal that outlives a compaction is harmless.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size)
+
+    def read_from(self, offset):
+        """
+        Reads the complete entries written after the given byte offset.
+
+        Returns:
+            A tuple of (entries, new_offset). A torn last line is left unread.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue # Torn write from an interrupted append
+        return entries, offset + end
+
+    def append(self, entries, fsync=False):
+        """
+        Appends entries to the journal in a single write; with fsync they reach the disk before it returns.
+        """
+        payload = "".join(dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        with open(self.path, "ab") as f:
+            if f.tell() > 0:
+                with open(self.path, "rb") as tail:
+                    tail.seek(-1, os.SEEK_END)
+                    if tail.read(1) != b"\n":
+                        payload = b"\n" + payload
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """
+        Removes the journal file once its entries are folded into the snapshot.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,139 @@
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+USERS_DIR = "database/users"
+# Users whose data a process keeps open at once; the least recently used beyond this
+# are closed. The shared data (owner None) is always kept open.
+MAX_OPEN_OWNERS = int(os.environ.get("TASK_MANAGER_MAX_OPEN_USERS", 64))
+
+
+def _directory_name(owner):
+    if not owner:
+        raise ValueError("An owner must be a non-empty name")
+    # Dots are escaped too, so a name can never step outside USERS_DIR.
+    return quote(owner, safe="").replace(".", "%2E")
+
+
+def owner_path(path, owner):
+    """
+    Returns the file that holds one owner's share of an entity, creating its directory.
+
+    Owner None keeps the shared files under database/, which the CLI and data from
+    before partitioning use. Each user's shard lives in a directory of its own, e.g.
+    database/tasks.txt -> database/users/alice/tasks.txt, so reading one user's data
+    never touches another's.
+    """
+    if owner is None:
+        return path
+    directory = os.path.join(USERS_DIR, _directory_name(owner))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(path))
+
+
+def list_owners():
+    """
+    Returns the names of the owners that have a shard, in sorted order.
+    """
+    try:
+        names = os.listdir(USERS_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(unquote(name) for name in names if os.path.isdir(os.path.join(USERS_DIR, name)))
+
+
+_open_owners = OrderedDict() # Owners in use, least recently used first
+_tables = [] # Every PerOwner, to close an owner's objects in all of them together
+_close_callbacks = []
+_owners_lock = threading.Lock()
+
+
+def on_owner_closed(callback):
+    """
+    Registers callback(owner) to run after close_owner(), e.g. to forget cached stores.
+    """
+    with _owners_lock:
+        _close_callbacks.append(callback)
+
+
+def _touch(owner):
+    if owner is None:
+        return
+    with _owners_lock:
+        if owner in _open_owners:
+            _open_owners.move_to_end(owner)
+            return
+        _open_owners[owner] = None
+        evicted = []
+        while len(_open_owners) > MAX_OPEN_OWNERS:
+            evicted.append(_open_owners.popitem(last=False)[0])
+    for idle_owner in evicted:
+        close_owner(idle_owner)
+
+
+def close_owner(owner):
+    """
+    Closes what this process keeps open for an owner: the objects every PerOwner made
+    for them, which stop their threads, and (through on_owner_closed()) their stores.
+    The next use opens them again from the files.
+
+    This happens by itself to the least recently used owner once more than
+    MAX_OPEN_OWNERS are open, so a long-running process does not keep every user
+    who ever logged in.
+    """
+    with _owners_lock:
+        _open_owners.pop(owner, None)
+        tables = list(_tables)
+        callbacks = list(_close_callbacks)
+    for table in tables:
+        table._close(owner)
+    for callback in callbacks:
+        callback(owner)
+
+
+class PerOwner:
+    """
+    Creates one object per owner with factory(owner) on first use and keeps it while the
+    owner is in use, like get_store() does for stores. Objects with a close() method
+    have it called when their owner is closed (see close_owner()); callers that still
+    hold one may go on using it.
+
+    on_open() registers a callback that runs for every object opened, e.g. to attach
+    another module's listeners to a partition as soon as it exists.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._partitions = {}
+        self._callbacks = []
+        self._lock = threading.RLock()
+        with _owners_lock:
+            _tables.append(self)
+
+    def __call__(self, owner=None):
+        partition = self._partitions.get(owner)
+        if partition is None:
+            with self._lock:
+                partition = self._partitions.get(owner)
+                if partition is None:
+                    partition = self.factory(owner)
+                    self._partitions[owner] = partition
+                    for callback in self._callbacks:
+                        callback(owner)
+        # Marked as used once it exists, so closing the owner meanwhile cannot miss it.
+        _touch(owner)
+        return partition
+
+    def _close(self, owner):
+        with self._lock:
+            partition = self._partitions.pop(owner, None)
+        if partition is not None and hasattr(partition, "close"):
+            partition.close()
+
+    def on_open(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+            owners = list(self._partitions)
+        for owner in owners:
+            callback(owner)
@@ -0,0 +1,126 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+
+_MISSING = object()
+
+
+def freeze(value):
+    """
+    Returns a read-only copy of a JSON value: dicts become mapping proxies and lists become tuples.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """
+    Returns a mutable copy of a frozen value, shaped exactly like json.loads would have returned it.
+    """
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) if isinstance(item, _FROZEN_TYPES) else item for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) if isinstance(item, _FROZEN_TYPES) else item for item in value]
+    return value
+
+
+class Record(Mapping):
+    """
+    Compact read-only record with a fixed set of fields stored in __slots__.
+
+    A record reads like the frozen mapping it replaces (record["field"], get(), items())
+    and keeps the fields' JSON values and their order, so to_dict() gives back exactly
+    the dict it was built from. Subclasses list their known fields in FIELDS, declare
+    __slots__ for those fields plus any derived attributes, and compute the derived
+    attributes in _derive(). Fields not listed in FIELDS are kept in a small dict.
+    """
+
+    __slots__ = ("_keys", "_extra")
+    FIELDS = ()
+    _field_set = frozenset()
+    _key_orders = {} # Shared key-order tuples, so records with the same keys share one
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+
+    def __init__(self, data):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, _MISSING)
+        extra = None
+        for key, value in data.items():
+            if key in self._field_set:
+                object.__setattr__(self, key, self._convert(key, value))
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = freeze(value)
+        keys = tuple(data)
+        self._keys = self._key_orders.setdefault(keys, keys)
+        self._extra = extra
+        self._derive()
+
+    @classmethod
+    def of(cls, data):
+        """
+        Returns data as a record of this type, reusing it if it already is one.
+        """
+        return data if isinstance(data, cls) else cls(data)
+
+    def _convert(self, key, value):
+        return freeze(value)
+
+    def _derive(self):
+        pass
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        """
+        Returns a mutable copy shaped exactly like json.loads would have returned it.
+        """
+        record = {}
+        for key in self._keys:
+            value = self[key]
+            record[key] = thaw(value) if isinstance(value, _FROZEN_TYPES) else value
+        return record
+
+    def replace(self, **fields):
+        """
+        Returns a copy of the record with the given fields changed.
+        """
+        return type(self)({**self, **fields})
+
+
+_FROZEN_TYPES = (MappingProxyType, tuple, Record)
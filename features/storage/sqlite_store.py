@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from features.storage.files import FileLock
+from features.storage.journal import dumps
+from features.storage.store import BaseStore
+
+# Key field and indexed columns for each table. The full record is kept as JSON in
+# the "data" column; the other columns are copies used only for indexed lookups.
+TABLE_SCHEMAS = {
+    "tasks": ("id", ("status", "category", "deadline")),
+    "reminders": ("id", ("remind_at",)),
+    "categories": ("id", ("name",)),
+    "users": ("username", ()),
+}
+
+# Columns compared case-insensitively, matching how the app checks for duplicates.
+NOCASE_COLUMNS = {"name"}
+
+
+class SqliteStore(BaseStore):
+    """
+    SQLite backend: one table per entity in a single database file.
+
+    Single-key lookups and filters on indexed columns go straight to SQLite. The
+    in-memory mirror used by records() is reloaded only when another connection
+    changes this table: PRAGMA data_version reports commits to any table in the file,
+    so the table's row in the versions table, bumped by every write, tells whether
+    this one was among them. Writes are SQLite transactions, so they are atomic; a
+    lock file per table serialises the read-then-write sequences run under
+    exclusive() across processes.
+    """
+
+    def __init__(self, db_path, table, key="id", record_type=None):
+        super().__init__(key, record_type)
+        self.path = db_path
+        self.table = table
+        self.columns = TABLE_SCHEMAS.get(table, (key, ()))[1]
+        self._connection = None
+        self._data_version = None
+        self._table_version = None # The versions row the mirror matches, or None to reload
+        self.file_lock = FileLock(f"{os.path.splitext(db_path)[0]}.{table}.lock")
+
+    def _connect(self):
+        if self._connection is not None:
+            return self._connection
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        key_type = "INTEGER" if self.key == "id" else "TEXT"
+        columns = "".join(f", {column} TEXT" for column in self.columns)
+        # seq keeps records in insertion order, like lines in the JSON-lines files.
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f"seq INTEGER PRIMARY KEY AUTOINCREMENT, {self.key} {key_type} NOT NULL UNIQUE{columns}, data TEXT NOT NULL)"
+        )
+        for column in self.columns:
+            collation = " COLLATE NOCASE" if column in NOCASE_COLUMNS else ""
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_{column} ON {self.table} ({column}{collation})")
+        connection.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        connection.execute("INSERT OR IGNORE INTO versions (name, version) VALUES (?, 0)", (self.table,))
+        if self.key == "id":
+            connection.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO sequences (name, last_id) VALUES (?, 0)", (self.table,))
+            # Recover the sequence if rows were written without it, e.g. by an older version.
+            connection.execute(
+                f"UPDATE sequences SET last_id = MAX(last_id, (SELECT COALESCE(MAX(id), 0) FROM {self.table})) WHERE name = ?",
+                (self.table,),
+            )
+        connection.commit()
+        self._connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self, connection):
+        # Inside batch() the statements join the batch's transaction, committed when it ends.
+        if self._batch is not None:
+            yield
+            return
+        with connection:
+            yield
+
+    def _commit(self, entries):
+        self._connect().commit()
+
+    def _rollback(self):
+        self._connect().rollback()
+        self._table_version = None
+
+    def _read_table_version(self, connection):
+        return connection.execute("SELECT version FROM versions WHERE name = ?", (self.table,)).fetchone()[0]
+
+    def _bump_table_version(self, connection):
+        (version,) = connection.execute(
+            "UPDATE versions SET version = version + 1 WHERE name = ? RETURNING version", (self.table,)
+        ).fetchone()
+        # The mirror takes in this write; it stays current only if nobody else wrote the table since it was read.
+        self._table_version = version if self._table_version is not None and version == self._table_version + 1 else None
+
+    def _ensure_fresh(self):
+        connection = self._connect()
+        data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if self._loaded and data_version == self._data_version:
+            return
+        self._data_version = data_version
+        # Another connection committed, but perhaps only to another table.
+        table_version = self._read_table_version(connection)
+        if self._loaded and table_version == self._table_version:
+            return
+        rows = connection.execute(f"SELECT data FROM {self.table} ORDER BY seq")
+        self._reset([self._freeze_record(json.loads(data)) for (data,) in rows])
+        self._table_version = table_version
+
+    def _row(self, record):
+        return (record[self.key], *(record.get(column) for column in self.columns), dumps(record))
+
+    def _write(self, connection, records):
+        names = (self.key, *self.columns, "data")
+        updates = ", ".join(f"{name} = excluded.{name}" for name in names[1:])
+        connection.executemany(
+            f"INSERT INTO {self.table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)}) "
+            f"ON CONFLICT ({self.key}) DO UPDATE SET {updates}",
+            [self._row(record) for record in records],
+        )
+        self._bump_table_version(connection)
+        ids = [record[self.key] for record in records if isinstance(record[self.key], int)]
+        if self.key == "id" and ids:
+            connection.execute("UPDATE sequences SET last_id = MAX(last_id, ?) WHERE name = ?", (max(ids), self.table))
+
+    def get(self, record_id):
+        """
+        Returns the read-only view of the record with the given key, or None.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT data FROM {self.table} WHERE {self.key} = ?", (record_id,)
+            ).fetchone()
+        return self._freeze_record(json.loads(row[0])) if row else None
+
+    def find(self, field, value, ignore_case=False):
+        """
+        Returns the records whose field equals value, using an index when the field has one.
+        """
+        if field != self.key and field not in self.columns:
+            return super().find(field, value, ignore_case)
+        collation = " COLLATE NOCASE" if ignore_case else ""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT data FROM {self.table} WHERE {field} = ?{collation} ORDER BY seq", (value,)
+            ).fetchall()
+        return tuple(self._freeze_record(json.loads(data)) for (data,) in rows)
+
+    def next_id(self):
+        """
+        Allocates the next record ID from the table's row in the sequences table.
+        """
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                (last_id,) = connection.execute(
+                    "UPDATE sequences SET last_id = last_id + 1 WHERE name = ? RETURNING last_id", (self.table,)
+                ).fetchone()
+            return last_id
+
+    def apply(self, upserts=(), deletes=()):
+        """
+        Writes a batch of record changes in one transaction and applies them to the mirror.
+
+        Args:
+            upserts: Records to insert or replace, matched by their key field.
+            deletes: Keys of records to remove.
+        """
+        upserts = [json.loads(dumps(record)) for record in upserts]
+        deletes = list(deletes)
+        if not upserts and not deletes:
+            return
+
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                self._write(connection, upserts)
+                connection.executemany(f"DELETE FROM {self.table} WHERE {self.key} = ?", [(record_id,) for record_id in deletes])
+            entries = [{"op": "upsert", "record": record} for record in upserts]
+            entries.extend({"op": "delete", "id": record_id} for record_id in deletes)
+            self._mirror(entries)
+
+    def _write_patch(self, record_id, fields):
+        fields = json.loads(dumps(fields))
+        paths = ", ".join(f"'$.\"{name}\"', json(?)" for name in fields)
+        columns = [name for name in fields if name in self.columns]
+        assignments = "".join(f", {column} = ?" for column in columns)
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                connection.execute(
+                    f"UPDATE {self.table} SET data = json_set(data, {paths}){assignments} WHERE {self.key} = ?",
+                    (*(dumps(value) for value in fields.values()), *(fields[column] for column in columns), record_id),
+                )
+                self._bump_table_version(connection)
+            self._mirror([{"op": "patch", "id": record_id, "fields": fields}])
+
+    def _mirror(self, entries):
+        # An unloaded mirror is left alone; it is read in full on the next records() call.
+        if self._loaded:
+            self._apply_entries(entries)
+
+    def replace_all(self, records, expected_version=None):
+        """
+        Replaces every record in the table in one transaction.
+
+        Args:
+            records: The complete new list of records.
+            expected_version: The version() the records were read at. If given and the
+                records changed since, ConflictError is raised and nothing is written.
+        """
+        records = [json.loads(dumps(record)) for record in records]
+        with self.exclusive():
+            self._check_version(expected_version)
+            connection = self._connect()
+            with self._transaction(connection):
+                connection.execute(f"DELETE FROM {self.table}")
+                self._write(connection, records)
+            # Reload rather than mirror, since duplicate keys collapse into one row.
+            self._loaded = False
@@ -0,0 +1,570 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from features.storage.files import FileLock, atomic_write
+from features.storage.journal import Journal, dumps, journal_path
+from features.storage.partitions import on_owner_closed, owner_path
+from features.storage.records import freeze, thaw
+
+# "jsonl" keeps every entity in database/*.txt; "sqlite" keeps them all in one SQLite file.
+STORAGE_BACKEND = os.environ.get("TASK_MANAGER_STORAGE", "jsonl")
+SQLITE_DATABASE_FILE = os.environ.get("TASK_MANAGER_SQLITE_DB", "database/task_manager.db")
+
+# Fold the journal back into the snapshot once it passes either limit.
+JOURNAL_MAX_RECORDS = 500
+JOURNAL_MAX_BYTES = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class ConflictError(Exception):
+    """
+    Raised when a write expected the records at one version but they had changed since.
+    """
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class BaseStore:
+    """
+    In-memory mirror of one entity's records, shared by the storage backends.
+
+    Records are kept in storage order and handed out as read-only views; callers that
+    need to modify them take a copy with thaw(). Records live in a dict keyed by their
+    load position, with a second dict from record key to position, so get(), upsert()
+    and delete() are O(1) while records() still yields storage order.
+
+    Subclasses load the mirror from their storage in _ensure_fresh() and persist
+    changes in apply() and replace_all(). They set file_lock to a FileLock shared with
+    the other processes using the same storage, which exclusive() takes for writes
+    that depend on what was read.
+
+    With a record_type (a Record subclass) the records are held as instances of it
+    instead of as frozen dicts.
+    """
+
+    def __init__(self, key="id", record_type=None):
+        self.key = key
+        self.record_type = record_type
+        self.generation = 0
+        self._lock = threading.RLock()
+        self._records = {} # Position -> frozen record, in storage order
+        self._keys = {} # Record key -> position
+        self._next_position = 0
+        self._last_id = 0 # Highest ID ever seen or allocated
+        self._view = ()
+        self._view_stale = False
+        self._loaded = False
+        self._listeners = []
+        self.file_lock = None
+        self._batch = None # Entries written inside batch() that are not committed yet
+        self._batch_changes = [] # Notifications held back until the batch commits
+
+    def _freeze_record(self, record):
+        if self.record_type is not None:
+            return self.record_type.of(record)
+        return freeze(record)
+
+    def _observe_id(self, record_id):
+        if isinstance(record_id, int) and record_id > self._last_id:
+            self._last_id = record_id
+
+    def _insert(self, record):
+        position = self._next_position
+        self._next_position += 1
+        self._records[position] = record
+        if self.key in record:
+            self._keys.setdefault(record[self.key], position)
+            self._observe_id(record[self.key])
+
+    def _apply_entries(self, entries):
+        changes = []
+        for entry in entries:
+            if entry["op"] == "upsert":
+                record = self._freeze_record(entry["record"])
+                position = self._keys.get(record[self.key])
+                if position is None:
+                    self._insert(record)
+                    changes.append((None, record))
+                else:
+                    changes.append((self._records[position], record))
+                    self._records[position] = record
+            elif entry["op"] == "patch":
+                position = self._keys.get(entry["id"])
+                if position is not None:
+                    old = self._records[position]
+                    self._records[position] = self._freeze_record({**old, **entry["fields"]})
+                    changes.append((old, self._records[position]))
+            elif entry["op"] == "delete":
+                self._observe_id(entry["id"])
+                position = self._keys.pop(entry["id"], None)
+                if position is not None:
+                    changes.append((self._records.pop(position), None))
+        self._view_stale = True
+        self.generation += 1
+        self._notify(changes)
+
+    def _reset(self, records, last_id=0):
+        self._records = {}
+        self._keys = {}
+        self._next_position = 0
+        self._last_id = last_id
+        for record in records:
+            self._insert(record)
+        self._view_stale = True
+        self._loaded = True
+        self.generation += 1
+        self._notify(None)
+
+    def _notify(self, changes):
+        if self._batch is not None:
+            self._batch_changes.append(changes)
+            return
+        for listener in self._listeners:
+            # The records are already written, so a failing listener must neither fail the
+            # write nor keep later listeners from hearing about it. It is told to rebuild
+            # instead, so what it derives from the records catches up on its next use.
+            try:
+                listener(changes)
+            except Exception:
+                logger.exception("Store listener %r failed", listener)
+                if changes is not None:
+                    try:
+                        listener(None)
+                    except Exception:
+                        logger.exception("Store listener %r failed to reset", listener)
+
+    def subscribe(self, listener):
+        """
+        Registers a function that is told about every change to the records.
+
+        The listener is called under the store lock with a list of (old, new) read-only
+        record pairs, where old is None for an insert and new is None for a delete. It is
+        called with None instead when the records were reloaded wholesale and anything
+        derived from them has to be rebuilt from records(), and also after it raised on a
+        change. Changes made inside batch() are reported once the batch has committed.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Holds the store lock, so a read followed by writes cannot interleave with other threads.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            yield self
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Holds the store lock and the inter-process file lock and refreshes the records, so a
+        read followed by writes cannot interleave with writes from other threads or processes.
+        """
+        with self._lock, self.file_lock:
+            self._ensure_fresh()
+            yield self
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups the writes made inside it into one commit.
+
+        The writes update the records as they are made, so later writes in the block
+        see earlier ones, and reach storage together, with a single fsync, when the
+        block ends. If the block raises or the commit fails, none of its writes are kept
+        and the records are reloaded from storage. A batch inside a batch joins the outer one.
+        Listeners hear about the changes after the commit, so they never see writes that
+        could still be rolled back.
+        """
+        with self.exclusive():
+            if self._batch is not None:
+                yield self
+                return
+            self._batch = []
+            try:
+                yield self
+                entries, self._batch = self._batch, None
+                self._commit(entries)
+            except BaseException:
+                self._batch = None
+                self._batch_changes = []
+                self._rollback()
+                self._loaded = False
+                raise
+            notifications, self._batch_changes = self._batch_changes, []
+            if None in notifications:
+                self._notify(None) # Reloaded during the batch; listeners rebuild from records()
+            else:
+                self._notify([change for changes in notifications for change in changes])
+
+    def _commit(self, entries):
+        raise NotImplementedError
+
+    def _rollback(self):
+        pass
+
+    def _check_version(self, expected_version):
+        if expected_version is not None and expected_version != self.generation:
+            raise ConflictError(f"The records changed since version {expected_version} was read")
+
+    def _ensure_fresh(self):
+        raise NotImplementedError
+
+    def records(self):
+        """
+        Returns all records as a tuple of read-only views, reloading them only if the storage changed.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            if self._view_stale:
+                self._view = tuple(self._records.values())
+                self._view_stale = False
+            return self._view
+
+    def version(self):
+        """
+        Returns a token that changes whenever the records change, whether through this
+        store or through another process, for keying caches of data derived from them.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return self.generation
+
+    def get(self, record_id):
+        """
+        Returns the read-only view of the record with the given key, or None.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            position = self._keys.get(record_id)
+            return self._records[position] if position is not None else None
+
+    def get_many(self, record_ids):
+        """
+        Returns the read-only views of the records with the given keys, in storage order.
+
+        Keys without a record are skipped.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            positions = sorted(self._keys[record_id] for record_id in record_ids if record_id in self._keys)
+            return tuple(self._records[position] for position in positions)
+
+    def find(self, field, value, ignore_case=False):
+        """
+        Returns the records whose field equals value, as a tuple of read-only views.
+        """
+        if ignore_case:
+            value = value.lower()
+            return tuple(record for record in self.records() if str(record.get(field, "")).lower() == value)
+        return tuple(record for record in self.records() if record.get(field) == value)
+
+    def next_id(self):
+        """
+        Allocates the next record ID in constant time.
+
+        IDs come from a sequence that is persisted with the data and only moves forward,
+        so an ID is never handed out twice, even after the highest record is deleted.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            self._last_id += 1
+            return self._last_id
+
+    def update(self, record_id, mutator):
+        """
+        Reads one record, lets mutator change a mutable copy of it and persists the result.
+
+        The read and the write happen under exclusive(), so concurrent updates of the
+        same record, from this process or another one, cannot overwrite each other.
+
+        Returns:
+            The updated record, or None if it does not exist or mutator returned False.
+        """
+        with self.exclusive():
+            record = self.get(record_id)
+            if record is None:
+                return None
+            record = thaw(record)
+            if mutator(record) is False:
+                return None
+            self.apply(upserts=[record])
+            return record
+
+    def patch(self, record_id, fields):
+        """
+        Changes only the given fields of one record, leaving the others untouched.
+
+        Args:
+            record_id: The key of the record to change.
+            fields: A dict of new field values, or a function that receives the current
+                read-only record and returns that dict.
+
+        Returns:
+            The updated read-only record, or None if it does not exist.
+        """
+        with self.exclusive():
+            record = self.get(record_id)
+            if record is None:
+                return None
+            if callable(fields):
+                fields = fields(record)
+            if fields:
+                self._write_patch(record_id, fields)
+            return self.get(record_id)
+
+    def _write_patch(self, record_id, fields):
+        raise NotImplementedError
+
+    def apply(self, upserts=(), deletes=()):
+        raise NotImplementedError
+
+    def upsert(self, record):
+        """
+        Inserts or replaces a single record.
+        """
+        self.apply(upserts=[record])
+
+    def delete(self, record_id):
+        """
+        Removes a single record by its key.
+        """
+        self.apply(deletes=[record_id])
+
+    def replace_all(self, records):
+        raise NotImplementedError
+
+    def invalidate(self):
+        """
+        Forces the next read to reload the records from storage.
+        """
+        with self._lock:
+            self._loaded = False
+
+
+class RecordStore(BaseStore):
+    """
+    JSON-lines backend: a snapshot file plus an append-only journal.
+
+    The contents are the snapshot file with its journal replayed on top. Single-record
+    changes are appended to the journal, so their cost does not depend on the size of
+    the database; the journal is compacted into the snapshot once it grows too large.
+    The files are only re-read when their signatures change, and a journal that only
+    grew is read from where the last read stopped.
+
+    Every write holds the entity's lock file, so processes append, compact and allocate
+    IDs one at a time, and snapshots are written to a temporary file and renamed into
+    place, so a crash mid-write never leaves a truncated file behind.
+    """
+
+    def __init__(self, path, key="id", record_type=None):
+        super().__init__(key, record_type)
+        self.path = path
+        self.journal = Journal(journal_path(path))
+        self.sequence_path = os.path.splitext(path)[0] + ".seq"
+        self.file_lock = FileLock(os.path.splitext(path)[0] + ".lock")
+        self._snapshot_signature = None
+        self._journal_signature = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    def _replay(self, entries):
+        self._apply_entries(entries)
+        self._journal_records += len(entries)
+
+    def _read_journal_tail(self):
+        entries, self._journal_offset = self.journal.read_from(self._journal_offset)
+        self._journal_signature = self.journal.signature()
+        if entries:
+            self._replay(entries)
+
+    def _reset(self, records, last_id=0):
+        super()._reset(records, last_id)
+        self._journal_signature = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    def _reload(self):
+        self._snapshot_signature = _file_signature(self.path)
+        try:
+            with open(self.path, "r") as f:
+                records = [self._freeze_record(json.loads(line)) for line in f]
+        except FileNotFoundError:
+            records = []
+        self._reset(records, max(self._last_id, self._read_sequence()))
+        self._read_journal_tail()
+
+    def _ensure_fresh(self):
+        if not self._loaded or _file_signature(self.path) != self._snapshot_signature:
+            self._reload()
+            return
+
+        journal_signature = self.journal.signature()
+        if journal_signature == self._journal_signature:
+            return
+        if (journal_signature and self._journal_signature
+                and journal_signature[0] == self._journal_signature[0]
+                and journal_signature[1] >= self._journal_offset):
+            self._read_journal_tail() # Another process appended to the journal
+        else:
+            self._reload()
+
+    def apply(self, upserts=(), deletes=()):
+        """
+        Appends a batch of record changes to the journal and applies them to the cache.
+
+        Args:
+            upserts: Records to insert or replace, matched by their key field.
+            deletes: Keys of records to remove.
+        """
+        entries = [{"op": "upsert", "record": record} for record in upserts]
+        entries.extend({"op": "delete", "id": record_id} for record_id in deletes)
+        if entries:
+            self._append(entries)
+
+    def _write_patch(self, record_id, fields):
+        # A patch entry holds only the changed fields, so it stays small however big the record is.
+        self._append([{"op": "patch", "id": record_id, "fields": fields}])
+
+    def _append(self, entries):
+        with self.exclusive():
+            if self._batch is not None:
+                # Round-tripped now, so the cache matches a replay and a bad value fails only this write.
+                entries = [json.loads(dumps(entry)) for entry in entries]
+                self._batch.extend(entries)
+                self._apply_entries(entries)
+                return
+            self.journal.append(entries)
+            # Re-read from the last known offset so entries appended by other processes in between are kept.
+            self._read_journal_tail()
+            self._compact_if_large()
+
+    def _commit(self, entries):
+        if not entries:
+            return
+        self.journal.append(entries, fsync=True)
+        # The batch held the file lock since the records were last read, so the journal
+        # holds nothing after the entries just written, which are applied already.
+        self._journal_signature = self.journal.signature()
+        self._journal_offset = self._journal_signature[1]
+        self._journal_records += len(entries)
+        self._compact_if_large()
+
+    def _compact_if_large(self):
+        journal_size = self._journal_signature[1] if self._journal_signature else 0
+        if self._journal_records >= JOURNAL_MAX_RECORDS or journal_size >= JOURNAL_MAX_BYTES:
+            self.compact()
+
+    def _read_sequence(self):
+        try:
+            with open(self.sequence_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def next_id(self):
+        """
+        Allocates the next record ID, reserving it in the sequence file so that another
+        process cannot hand out the same ID before the record is written.
+        """
+        with self.exclusive():
+            self._last_id = max(self._last_id, self._read_sequence()) + 1
+            # Inside a batch the file lock is held until the record is written, so no reservation is needed.
+            if self._batch is None:
+                atomic_write(self.sequence_path, str(self._last_id), fsync=False)
+            return self._last_id
+
+    def _write_snapshot(self, records):
+        atomic_write(self.path, "".join(dumps(record) + "\n" for record in records))
+        # The journal kept deleted IDs visible; once it is folded in, the sequence file remembers them.
+        self._last_id = max(self._last_id, self._read_sequence())
+        atomic_write(self.sequence_path, str(self._last_id), fsync=False)
+        self.journal.clear()
+
+    def compact(self):
+        """
+        Folds the journal into a new snapshot and removes the journal.
+        """
+        with self.exclusive():
+            self._write_snapshot(self._records.values())
+            self._snapshot_signature = _file_signature(self.path)
+            self._journal_signature = None
+            self._journal_offset = 0
+            self._journal_records = 0
+
+    def replace_all(self, records, expected_version=None):
+        """
+        Writes the given records as a new snapshot and makes them the cached contents.
+
+        Args:
+            records: The complete new list of records.
+            expected_version: The version() the records were read at. If given and the
+                records changed since, ConflictError is raised and nothing is written.
+        """
+        with self.exclusive():
+            self._check_version(expected_version)
+            if self._batch is not None:
+                self._batch.clear() # Superseded by the new snapshot
+            self._write_snapshot(records)
+            self._reset([self._freeze_record(record) for record in records], self._last_id)
+            self._snapshot_signature = _file_signature(self.path)
+
+
+_stores = {}
+_owner_stores = {} # Owner -> the registry keys of their stores
+_stores_lock = threading.Lock()
+
+
+def get_store(path, key="id", record_type=None, owner=None):
+    """
+    Returns the process-wide store for an entity, creating it on first use.
+
+    Args:
+        path: The entity's JSON-lines file, e.g. "database/tasks.txt". With the SQLite
+            backend the file name selects the table instead.
+        key: The field that identifies a record.
+        record_type: An optional Record subclass to hold the records in. Like key, it
+            only takes effect when the store is created.
+        owner: The user whose shard to open (see partitions.owner_path), or None for
+            the shared files. With SQLite each owner has a database file of their own.
+    """
+    with _stores_lock:
+        if STORAGE_BACKEND == "sqlite":
+            from features.storage.sqlite_store import SqliteStore
+            table = os.path.splitext(os.path.basename(path))[0]
+            db_path = owner_path(SQLITE_DATABASE_FILE, owner)
+            registry_key = (os.path.abspath(db_path), table)
+            factory = lambda: SqliteStore(db_path, table, key, record_type)
+        elif STORAGE_BACKEND == "jsonl":
+            path = owner_path(path, owner)
+            registry_key = os.path.abspath(path)
+            factory = lambda: RecordStore(path, key, record_type)
+        else:
+            raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+
+        store = _stores.get(registry_key)
+        if store is None:
+            store = factory()
+            _stores[registry_key] = store
+            if owner is not None:
+                _owner_stores.setdefault(owner, set()).add(registry_key)
+        return store
+
+
+def _forget_owner(owner):
+    # Objects still holding the stores keep working; the next get_store() opens new ones.
+    with _stores_lock:
+        for registry_key in _owner_stores.pop(owner, ()):
+            _stores.pop(registry_key, None)
+
+on_owner_closed(_forget_owner)
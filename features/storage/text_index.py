@@ -0,0 +1,256 @@
+import heapq
+import json
+import math
+import re
+import threading
+import zlib
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from features.storage.files import atomic_write
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# A query term that only matches as the prefix of a word scores this fraction of an exact match.
+PREFIX_MATCH_WEIGHT = 0.5
+
+# Rewrite the persisted index, on a background thread, after this many changed records.
+SAVE_EVERY_CHANGES = 200
+
+
+def tokenize(text):
+    """
+    Splits text into lower-cased word tokens.
+    """
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+class TextIndex:
+    """
+    Full-text inverted index over some text fields of one store's records.
+
+    Every token maps to a posting list of {record key: weight}, where the weight adds up
+    the weights of the fields the token appears in. A sorted vocabulary makes prefix
+    queries a bisect range scan. The index follows the store's change notifications
+    and is persisted as JSON next to the data; when it is loaded, only records whose
+    text no longer matches the stored checksum are tokenized again. The file is only a
+    cache, so it is written on a background thread, never under the store's lock.
+    """
+
+    def __init__(self, store, fields, path=None):
+        """
+        Args:
+            store: The store whose records are indexed.
+            fields: A dict of field name -> weight. List fields (e.g. tags) are indexed item by item.
+            path: The file the index is persisted to, or None to keep it in memory only.
+        """
+        self.store = store
+        self.fields = dict(fields)
+        self.path = path
+        self._postings = {} # Token -> {record key: weight}
+        self._vocabulary = [] # Sorted tokens
+        self._docs = {} # Record key -> (checksum, {token: weight})
+        self._stale = True
+        self._unsaved = 0
+        self._lock = threading.Lock() # Guards _docs against the saver thread copying it
+        self._write_lock = threading.Lock() # Keeps an older copy from replacing a newer one
+        self._save_requested = threading.Event()
+        self._saver = None
+        self._closed = False
+        store.subscribe(self._on_change)
+
+    def _texts(self, record):
+        for field in self.fields:
+            value = record.get(field)
+            if isinstance(value, (list, tuple)):
+                value = " ".join(str(item) for item in value)
+            yield field, "" if value is None else str(value)
+
+    def _checksum(self, record):
+        return zlib.crc32("\x1f".join(text for _, text in self._texts(record)).encode("utf-8"))
+
+    def _weights(self, record):
+        weights = {}
+        for field, text in self._texts(record):
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0) + self.fields[field]
+        return weights
+
+    def _add(self, key, checksum, weights):
+        # The weights dict is never changed afterwards, so the saver can share it.
+        self._docs[key] = (checksum, weights)
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                insort(self._vocabulary, token)
+            posting[key] = weight
+
+    def _remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            posting = self._postings[token]
+            del posting[key]
+            if not posting:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def _on_change(self, changes):
+        if changes is None:
+            self._stale = True
+            return
+        if self._stale:
+            return
+        with self._lock:
+            for old, new in changes:
+                if old is not None:
+                    self._remove(old.get(self.store.key))
+                if new is not None:
+                    self._add(new.get(self.store.key), self._checksum(new), self._weights(new))
+        self._unsaved += len(changes)
+        if self._unsaved >= SAVE_EVERY_CHANGES:
+            self._save_soon()
+
+    def _load_saved(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if saved.get("fields") != self.fields:
+            return {}
+        return saved.get("docs", {})
+
+    def _rebuild(self):
+        saved = self._load_saved()
+        records = self.store.records()
+        self._stale = False
+        docs = {}
+        self._postings = {}
+        reused = 0
+        for record in records:
+            key = record.get(self.store.key)
+            checksum = self._checksum(record)
+            doc = saved.get(str(key))
+            if doc is not None and doc[0] == checksum:
+                weights = doc[1]
+                reused += 1
+            else:
+                weights = self._weights(record)
+            docs[key] = (checksum, weights)
+            for token, weight in weights.items():
+                self._postings.setdefault(token, {})[key] = weight
+        with self._lock:
+            self._docs = docs
+        self._vocabulary = sorted(self._postings)
+        self._unsaved = 0
+        if reused != len(saved) or reused != len(docs):
+            self._save_soon()
+
+    @contextmanager
+    def _current(self):
+        # store.transaction() first picks up changes made by other processes.
+        with self.store.transaction():
+            if self._stale:
+                self._rebuild()
+            yield
+
+    def _write(self):
+        if self.path is None:
+            return
+        with self._write_lock:
+            with self._lock:
+                docs = dict(self._docs)
+            # Serialising a large index takes seconds. Only the copy above blocks the store,
+            # and dumping one record at a time lets other threads run in between.
+            entries = (f"{json.dumps(str(key))}: {json.dumps([checksum, weights])}" for key, (checksum, weights) in docs.items())
+            atomic_write(self.path, f'{{"fields": {json.dumps(self.fields)}, "docs": {{{", ".join(entries)}}}}}', fsync=False)
+
+    def _save_soon(self):
+        self._unsaved = 0
+        if self.path is None:
+            return
+        with self._lock:
+            if self._closed:
+                return # Not saved again; the next load re-tokenizes the records changed since
+            if self._saver is None:
+                self._saver = threading.Thread(target=self._run_saver, name="text-index-saver", daemon=True)
+                self._saver.start()
+        self._save_requested.set()
+
+    def _run_saver(self):
+        while True:
+            self._save_requested.wait()
+            self._save_requested.clear()
+            try:
+                self._write()
+            except OSError:
+                pass # The file is only a cache: a stale copy just means re-tokenizing on the next load.
+            with self._lock:
+                if self._closed and not self._save_requested.is_set():
+                    return
+
+    def close(self):
+        """
+        Stops the saver thread once it has written the index a last time. The index
+        stays usable, e.g. by a caller that still holds it, but is not saved again.
+        """
+        with self._lock:
+            self._closed = True
+            if self._saver is None:
+                return
+        self._save_requested.set()
+
+    def save(self):
+        """
+        Writes the index to its file, replacing the previous copy in one step.
+        """
+        with self._current():
+            pass
+        self._write()
+
+    def _matching_tokens(self, term):
+        position = bisect_left(self._vocabulary, term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            yield self._vocabulary[position]
+            position += 1
+
+    def search(self, query, limit=None):
+        """
+        Ranks the records that contain every term of the query, either as a word or as the start of one.
+
+        Each term scores the field weight times the inverse document frequency of the
+        best word it matches, and prefix matches score less than whole words.
+
+        Returns:
+            A list of (record key, score) pairs, best first, at most limit long.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._current():
+            total = len(self._docs)
+            scores = None
+            for term in dict.fromkeys(terms):
+                term_scores = {}
+                for token in self._matching_tokens(term):
+                    posting = self._postings[token]
+                    factor = math.log(1 + total / len(posting)) * (1 if token == term else PREFIX_MATCH_WEIGHT)
+                    for key, weight in posting.items():
+                        score = weight * factor
+                        if score > term_scores.get(key, 0):
+                            term_scores[key] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {key: scores[key] + score for key, score in term_scores.items() if key in scores}
+                if not scores:
+                    return []
+
+        if limit is None:
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,88 @@
+from datetime import date, datetime
+from features.storage.records import Record
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TimeEntry(Record):
+    """
+    One tracked session of a task.
+
+    Besides the stored start_time and end_time strings it holds them parsed as start
+    and end (end is None while the session runs) and the session length in seconds
+    (None while it runs).
+    """
+
+    FIELDS = ("start_time", "end_time")
+    __slots__ = FIELDS + ("start", "end", "seconds")
+
+    def _derive(self):
+        self.start = _parse_datetime(self.get("start_time"))
+        self.end = _parse_datetime(self.get("end_time"))
+        self.seconds = (self.end - self.start).total_seconds() if self.start and self.end else None
+
+
+def sum_finished_seconds(time_entries):
+    """
+    Returns the total length in seconds of the finished time entries (dicts or TimeEntry records).
+    """
+    return round(sum(TimeEntry.of(entry).seconds or 0 for entry in time_entries), 6)
+
+
+class Task(Record):
+    """
+    A task as held by the task store.
+
+    It reads like the task dict it was loaded from and serialises back to exactly that
+    dict, and it carries the values that readers used to parse again on every use:
+        created_date, deadline_date: created_at and deadline as dates (None if missing).
+        completed_time: completed_at as a datetime (None if missing).
+        finished_seconds: the persisted tracked_seconds total of the finished sessions,
+            or the finished time entries summed for tasks saved before it was kept.
+        session_start: the start of the running session as a datetime (None if not tracking).
+    """
+
+    FIELDS = (
+        "id", "title", "description", "category", "priority", "status", "created_at",
+        "deadline", "tags", "is_recurring", "recurrence_rule", "last_recurred_at",
+        "time_entries", "is_tracking", "completed_at", "tracked_seconds", "tracking_started_at",
+    )
+    __slots__ = FIELDS + ("created_date", "deadline_date", "completed_time", "finished_seconds", "session_start")
+
+    def _convert(self, key, value):
+        if key == "time_entries" and isinstance(value, (list, tuple)):
+            return tuple(TimeEntry.of(entry) for entry in value)
+        return super()._convert(key, value)
+
+    def _derive(self):
+        self.created_date = _parse_date(self.get("created_at"))
+        self.deadline_date = _parse_date(self.get("deadline"))
+        self.completed_time = _parse_datetime(self.get("completed_at"))
+        time_entries = self.get("time_entries") or ()
+        tracked_seconds = self.get("tracked_seconds")
+        self.finished_seconds = tracked_seconds if tracked_seconds is not None else sum_finished_seconds(time_entries)
+        self.session_start = None
+        if self.get("is_tracking"):
+            self.session_start = _parse_datetime(self.get("tracking_started_at"))
+            if self.session_start is None and time_entries and time_entries[-1].end is None:
+                self.session_start = time_entries[-1].start
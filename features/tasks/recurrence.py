@@ -0,0 +1,153 @@
+import heapq
+from datetime import date, datetime, timedelta
+from features.storage.store import thaw
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def next_occurrence(rule, last_recurred):
+    """
+    Returns the date a recurring task is next due after it last recurred on last_recurred.
+
+    Daily tasks recur the next day, weekly tasks seven days later and monthly tasks on
+    the first day of the following calendar month, so December rolls over into January.
+    Returns None for an unknown rule.
+    """
+    if rule == "daily":
+        return last_recurred + timedelta(days=1)
+    if rule == "weekly":
+        return last_recurred + timedelta(weeks=1)
+    if rule == "monthly":
+        if last_recurred.month == 12:
+            return date(last_recurred.year + 1, 1, 1)
+        return date(last_recurred.year, last_recurred.month + 1, 1)
+    return None
+
+
+def _due_date(template):
+    if not template.get("is_recurring") or not template.get("last_recurred_at"):
+        return None
+    try:
+        last_recurred = datetime.strptime(template["last_recurred_at"], DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None
+    return next_occurrence(template.get("recurrence_rule"), last_recurred)
+
+
+def _make_instance(template, task_id, occurrence):
+    instance = dict(template)
+    instance.update({
+        "id": task_id,
+        "is_recurring": False,
+        "recurrence_rule": None,
+        "last_recurred_at": None,
+        "created_at": occurrence.strftime(DATE_FORMAT),
+        "status": "Pending",
+        "time_entries": [],
+        "is_tracking": False,
+        "tracked_seconds": 0,
+        "tracking_started_at": None,
+    })
+    instance.pop("completed_at", None)
+    return instance
+
+
+class RecurrenceEngine:
+    """
+    Creates the task instances owed by recurring task templates.
+
+    Templates are kept in a min-heap ordered by their next due date, which is kept up
+    to date from the store's change notifications instead of by rescanning the tasks.
+    run_due() only looks at the head of the heap, so it costs O(1) when nothing is due;
+    when templates are due it creates every missed occurrence in one batched write.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._heap = [] # (due date, template ID); entries that no longer match _due are skipped
+        self._due = {} # Template ID -> current due date
+        self._stale = True
+        store.subscribe(self._on_change)
+
+    def _push(self, template):
+        due = _due_date(template)
+        if due is not None:
+            self._due[template["id"]] = due
+            heapq.heappush(self._heap, (due, template["id"]))
+
+    def _on_change(self, changes):
+        if changes is None:
+            self._stale = True
+            return
+        if self._stale:
+            return
+        for old, new in changes:
+            template_id = (new if new is not None else old).get("id")
+            due = _due_date(new) if new is not None else None
+            if due == self._due.get(template_id):
+                continue # E.g. time tracking on a template: its heap entry still holds
+            if due is None:
+                self._due.pop(template_id, None)
+            else:
+                self._due[template_id] = due
+                heapq.heappush(self._heap, (due, template_id))
+
+    def _rebuild(self):
+        self._heap = []
+        self._due = {}
+        for task in self.store.records():
+            self._push(task)
+        self._stale = False
+
+    def next_due(self):
+        """
+        Returns the earliest date on which a recurring task is due, or None if there is none.
+        """
+        with self.store.transaction():
+            if self._stale:
+                self._rebuild()
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self, today=None):
+        """
+        Creates the instances of every recurring task that is due on or before today.
+
+        Returns:
+            The list of newly created task dictionaries.
+        """
+        today = today or date.today()
+        # Most calls find nothing due; only those that do take the cross-process write lock.
+        due = self.next_due()
+        if due is None or due > today:
+            return []
+        with self.store.exclusive():
+            # Checked again: another process may have created the instances meanwhile.
+            due = self.next_due()
+            if due is None or due > today:
+                return []
+
+            templates = []
+            instances = []
+            # One commit for the ID sequence and every instance, however many are owed.
+            with self.store.batch():
+                while self._heap and self._heap[0][0] <= today:
+                    due, template_id = heapq.heappop(self._heap)
+                    if self._due.get(template_id) != due:
+                        continue
+                    del self._due[template_id]
+                    template = self.store.get(template_id)
+                    if template is None:
+                        continue
+                    template = thaw(template)
+                    occurrence = due
+                    while occurrence is not None and occurrence <= today:
+                        instances.append(_make_instance(template, self.store.next_id(), occurrence))
+                        template["last_recurred_at"] = occurrence.strftime(DATE_FORMAT)
+                        occurrence = next_occurrence(template["recurrence_rule"], occurrence)
+                    templates.append(template)
+
+                # The change notification for the templates pushes their next due dates.
+                self.store.apply(upserts=templates + instances)
+            return instances
@@ -1,83 +1,227 @@
 import questionary
 from rich.console import Console
 from rich.table import Table
-import json
-from datetime import datetime, timedelta
+from datetime import date, datetime
+from features.storage.group_commit import WriteCoordinator
+from features.storage.indexes import SecondaryIndex
+from features.storage.partitions import PerOwner, owner_path
+from features.storage.store import get_store, thaw
+from features.storage.text_index import TextIndex
+from features.tasks.records import Task, sum_finished_seconds
+from features.tasks.recurrence import RecurrenceEngine
 
 console = Console()
 DATABASE_FILE = "database/tasks.txt"
+SEARCH_INDEX_FILE = "database/tasks.search.json"
 
-def _get_next_id(tasks):
-    if not tasks:
-        return 1
-    return max(task["id"] for task in tasks) + 1
+def get_task_store(owner=None):
+    """
+    This function returns the store that holds an owner's tasks, e.g. for other modules to listen to.
+    """
+    return get_store(DATABASE_FILE, record_type=Task, owner=owner)
 
-def get_all_tasks():
+class _TaskData:
     """
-    This function retrieves all tasks from the database file and generates recurring tasks.
-    
+    One owner's task store with the write coordinator, engine and indexes kept over it.
+    """
+
+    def __init__(self, owner):
+        self.store = get_task_store(owner)
+        # Task writes from concurrent sessions are committed together, with one fsync per batch.
+        self.writes = WriteCoordinator(self.store)
+        self.recurrence = RecurrenceEngine(self.store)
+        self.index = SecondaryIndex(self.store, fields=("status", "category", "priority"), tag_fields=("tags",), sorted_fields=("deadline",))
+        # Matches in the title rank above matches in tags, which rank above matches in the description.
+        self.search_index = TextIndex(self.store, {"title": 3, "tags": 2, "description": 1}, owner_path(SEARCH_INDEX_FILE, owner))
+
+    def close(self):
+        # Called when the owner has been idle the longest (see partitions.close_owner()).
+        self.writes.close()
+        self.search_index.close()
+
+# Every data function takes the owner whose tasks it works on: the logged-in user in the
+# dashboard, or None for the shared tasks the CLI uses. Each owner's tasks are a separate
+# shard, so one user's reads and writes never load another user's tasks.
+_partitions = PerOwner(_TaskData)
+
+def on_tasks_opened(callback):
+    """
+    This function registers callback(owner) to run for every owner whose tasks this process
+    opens, including those opened already, e.g. to attach listeners to their task store.
+    """
+    _partitions.on_open(callback)
+
+def get_next_task_id(owner=None):
+    """
+    This function allocates a new task ID from the task store's persisted sequence.
+    """
+    return _partitions(owner).store.next_id()
+
+def materialize_recurring_tasks(today=None, owner=None):
+    """
+    This function creates the instances that recurring tasks owe up to today, including
+    any occurrences missed while the app was not running.
+
+    Reading tasks never does this by itself; entry points call it once per run or page view.
+    It only compares one date when nothing is due, so calling it often is cheap.
+
     Returns:
-        A list of task dictionaries.
+        The list of newly created task dictionaries.
     """
-    try:
-        with open(DATABASE_FILE, "r") as f:
-            tasks = [json.loads(line) for line in f]
-    except FileNotFoundError:
-        tasks = []
+    return _partitions(owner).recurrence.run_due(today)
 
-    newly_generated_tasks = []
-    today = datetime.now().date()
+def get_all_tasks(owner=None):
+    """
+    This function retrieves all tasks from the database file.
     
-    # Use a copy of tasks to avoid modifying the list while iterating
-    for task in list(tasks):
-        if task.get("is_recurring"):
-            last_recurred = datetime.strptime(task["last_recurred_at"], "%Y-%m-%d").date()
-            should_recur = False
-            
-            if task["recurrence_rule"] == "daily" and last_recurred < today:
-                should_recur = True
-            elif task["recurrence_rule"] == "weekly" and last_recurred <= today - timedelta(weeks=1):
-                should_recur = True
-            elif task["recurrence_rule"] == "monthly" and last_recurred.month < today.month:
-                should_recur = True
-
-            if should_recur:
-                new_task = task.copy()
-                new_task["id"] = _get_next_id(tasks + newly_generated_tasks)
-                new_task["is_recurring"] = False
-                new_task["recurrence_rule"] = None
-                new_task["last_recurred_at"] = None
-                new_task["created_at"] = today.strftime("%Y-%m-%d")
-                new_task["status"] = "Pending"
-                newly_generated_tasks.append(new_task)
-                
-                # Update the last recurred date of the template task
-                task["last_recurred_at"] = today.strftime("%Y-%m-%d")
-
-    if newly_generated_tasks:
-        tasks.extend(newly_generated_tasks)
-        save_tasks(tasks)
-
-    return tasks
-
-def save_tasks(tasks):
+    Returns:
+        A list of task dictionaries. The dictionaries are fresh copies, so callers may modify them.
+    """
+    return [thaw(task) for task in _partitions(owner).store.records()]
+
+def get_task_views(owner=None):
+    """
+    This function retrieves all tasks as read-only views of the cached task store.
+
+    Use it instead of get_all_tasks() when the tasks are only read. The views are Task
+    records, which also carry the parsed dates and the tracked time (see records.py).
+
+    Returns:
+        A tuple of read-only Task records.
+    """
+    return _partitions(owner).store.records()
+
+def _deadline_key(value):
+    return value.strftime("%Y-%m-%d") if isinstance(value, date) else value
+
+def find_task_ids(status=None, category=None, priority=None, tag=None, due_from=None, due_to=None, ignore_case=False, owner=None):
+    """
+    This function returns the IDs of the tasks that match every given filter, using the task indexes.
+
+    Args:
+        status, category, priority: Values to match exactly, or ignoring case if ignore_case is set.
+        tag: A tag the task must have, compared ignoring case.
+        due_from, due_to: Inclusive deadline bounds, as dates or "YYYY-MM-DD" strings.
+
+    Returns:
+        A set of task IDs. Filters left as None are not applied, so no filters match every task.
+    """
+    data = _partitions(owner)
+    matches = []
+    for field, value in (("status", status), ("category", category), ("priority", priority)):
+        if value is not None:
+            matches.append(data.index.keys(field, value, ignore_case))
+    if tag is not None:
+        matches.append(data.index.keys("tags", tag))
+    if due_from is not None or due_to is not None:
+        matches.append(data.index.range("deadline", _deadline_key(due_from), _deadline_key(due_to)))
+
+    if not matches:
+        return {task["id"] for task in data.store.records()}
+    matches.sort(key=len)
+    return matches[0].intersection(*matches[1:])
+
+def tasks_due_between(start=None, end=None, include_completed=False, owner=None):
+    """
+    This function retrieves the tasks whose deadline lies between start and end, using
+    the sorted deadline index instead of reading every task.
+
+    Args:
+        start, end: Inclusive deadline bounds, as dates or "YYYY-MM-DD" strings. None leaves that side open.
+        include_completed: Whether completed tasks are included.
+
+    Returns:
+        A list of read-only Task records, earliest deadline first.
+    """
+    data = _partitions(owner)
+    task_ids = data.index.ordered("deadline", _deadline_key(start), _deadline_key(end))
+    tasks_by_id = {task["id"]: task for task in data.store.get_many(task_ids)}
+    due = [tasks_by_id[task_id] for task_id in task_ids if task_id in tasks_by_id]
+    if not include_completed:
+        due = [task for task in due if task["status"] != "Completed"]
+    return due
+
+def get_task_views_by_ids(task_ids, owner=None):
+    """
+    This function retrieves the tasks with the given IDs as read-only views, in storage order.
+    """
+    return _partitions(owner).store.get_many(task_ids)
+
+def filter_tasks(owner=None, **filters):
+    """
+    This function retrieves the tasks that match the given filters (see find_task_ids) as read-only views.
+
+    Returns:
+        A tuple of read-only task mappings in storage order.
+    """
+    return get_task_views_by_ids(find_task_ids(owner=owner, **filters), owner)
+
+def count_tasks(**filters):
+    """
+    This function counts the tasks that match the given filters (see find_task_ids).
+    """
+    return len(find_task_ids(**filters))
+
+def count_tasks_by(field, owner=None):
+    """
+    This function counts the tasks for each value of an indexed field.
+
+    Args:
+        field: "status", "category", "priority" or "tags". Tags are counted lower-cased.
+
+    Returns:
+        A dict mapping each value to its number of tasks.
+    """
+    return _partitions(owner).index.counts(field)
+
+def search_tasks(query, limit=20, owner=None):
+    """
+    This function searches task titles, descriptions and tags.
+
+    Every word of the query has to appear in the task, either whole or as the start of
+    a longer word, so "rep" finds "report".
+
+    Args:
+        query: The words to search for.
+        limit: The maximum number of results, or None for all of them.
+
+    Returns:
+        A list of read-only task mappings, best match first.
+    """
+    ranked_ids = [task_id for task_id, _ in _partitions(owner).search_index.search(query, limit)]
+    tasks_by_id = {task["id"]: task for task in get_task_views_by_ids(ranked_ids, owner)}
+    return [tasks_by_id[task_id] for task_id in ranked_ids if task_id in tasks_by_id]
+
+def get_tasks_version(owner=None):
+    """
+    This function returns a token that changes whenever the tasks change, to pass to save_tasks().
+    """
+    return _partitions(owner).store.version()
+
+def get_write_stats(owner=None):
+    """
+    This function returns the group-commit statistics of an owner's task writes in this process:
+    commits, operations, operations per commit, fsyncs per second and p99 latency in ms.
+    """
+    return _partitions(owner).writes.stats()
+
+def save_tasks(tasks, expected_version=None, owner=None):
     """
     This function saves a list of tasks to the database file.
     
     Args:
         tasks: A list of task dictionaries.
+        expected_version: The get_tasks_version() the list was read at. If the tasks
+            changed since, ConflictError is raised and nothing is written.
     """
-    with open(DATABASE_FILE, "w") as f:
-        for task in tasks:
-            f.write(json.dumps(task) + "\n")
+    _partitions(owner).store.replace_all(tasks, expected_version)
 
-def add_task_data(title, description, category, priority, deadline, tags, is_recurring=False, recurrence_rule=None):
+def add_task_data(title, description, category, priority, deadline, tags, is_recurring=False, recurrence_rule=None, owner=None):
     """
     This function adds a new task to the database.
     """
-    tasks = get_all_tasks()
     new_task = {
-        "id": _get_next_id(tasks),
+        "id": None, # Allocated when the task is written
         "title": title,
         "description": description,
         "category": category,
@@ -91,115 +235,184 @@ def add_task_data(title, description, category, priority, deadline, tags, is_rec
         "last_recurred_at": datetime.now().strftime("%Y-%m-%d") if is_recurring else None,
         "time_entries": [],
         "is_tracking": False,
+        "tracked_seconds": 0,
+        "tracking_started_at": None,
     }
-    tasks.append(new_task)
-    save_tasks(tasks)
-    return new_task
 
-def edit_task_data(task_id, title, description, category, priority, deadline, status, tags, is_recurring=False, recurrence_rule=None):
+    def insert(store):
+        new_task["id"] = store.next_id()
+        store.upsert(new_task)
+        return new_task
+
+    return _partitions(owner).writes.submit(insert)
+
+def update_task(task_id, mutator, owner=None):
+    """
+    This function applies a change to a single task with one read and one write.
+
+    Args:
+        task_id: The ID of the task to change.
+        mutator: A function that receives a mutable copy of the task and changes it in place.
+            It can return False to leave the task unchanged.
+
+    Returns:
+        The updated task dictionary, or None if the task was not found or the mutator declined.
+    """
+    return _partitions(owner).writes.submit(lambda store: store.update(task_id, mutator))
+
+def _status_fields(task, status):
+    """
+    This function returns the fields that change when a task moves to a new status.
+
+    Completing a task stamps "completed_at"; moving it out of "Completed" clears the stamp.
+    """
+    fields = {"status": status}
+    if status == "Completed" and task.get("status") != "Completed":
+        fields["completed_at"] = datetime.now().isoformat(timespec="seconds")
+    elif status != "Completed" and task.get("completed_at"):
+        fields["completed_at"] = None
+    return fields
+
+def patch_task(task_id, owner=None, **fields):
+    """
+    This function changes only the given fields of a task and writes just those fields.
+
+    A "deadline" may be given as a date, and a "status" change records or clears "completed_at".
+
+    Returns:
+        The updated task dictionary, or None if the task was not found.
+    """
+    if isinstance(fields.get("deadline"), date):
+        fields["deadline"] = fields["deadline"].strftime("%Y-%m-%d")
+
+    def changes(task):
+        if "status" in fields:
+            return {**_status_fields(task, fields["status"]), **fields}
+        return fields
+
+    task = _partitions(owner).writes.submit(lambda store: store.patch(task_id, changes))
+    return thaw(task) if task is not None else None
+
+def set_task_status(task_id, status, owner=None):
+    """
+    This function moves a task to a new status, e.g. from a Kanban quick action.
+    """
+    return patch_task(task_id, owner=owner, status=status)
+
+def edit_task_data(task_id, title, description, category, priority, deadline, status, tags, is_recurring=False, recurrence_rule=None, owner=None):
     """
     This function edits an existing task's data.
     """
-    tasks = get_all_tasks()
-    task_to_edit = None
-    for task in tasks:
-        if task["id"] == task_id:
-            task_to_edit = task
-            break
-    
-    if not task_to_edit:
-        return None
-
-    task_to_edit["title"] = title
-    task_to_edit["description"] = description
-    task_to_edit["category"] = category
-    task_to_edit["priority"] = priority
-    if isinstance(deadline, str):
-        task_to_edit["deadline"] = deadline
-    else:
-        task_to_edit["deadline"] = deadline.strftime("%Y-%m-%d") if deadline else None
-    task_to_edit["status"] = status
-    task_to_edit["tags"] = tags
-    task_to_edit["is_recurring"] = is_recurring
-    task_to_edit["recurrence_rule"] = recurrence_rule
-    if is_recurring and not task_to_edit.get("last_recurred_at"):
-        task_to_edit["last_recurred_at"] = datetime.now().strftime("%Y-%m-%d")
+    def apply_edit(task_to_edit):
+        task_to_edit["title"] = title
+        task_to_edit["description"] = description
+        task_to_edit["category"] = category
+        task_to_edit["priority"] = priority
+        if isinstance(deadline, str):
+            task_to_edit["deadline"] = deadline
+        else:
+            task_to_edit["deadline"] = deadline.strftime("%Y-%m-%d") if deadline else None
+        task_to_edit.update(_status_fields(task_to_edit, status))
+        task_to_edit["tags"] = tags
+        task_to_edit["is_recurring"] = is_recurring
+        task_to_edit["recurrence_rule"] = recurrence_rule
+        if is_recurring and not task_to_edit.get("last_recurred_at"):
+            task_to_edit["last_recurred_at"] = datetime.now().strftime("%Y-%m-%d")
 
-    save_tasks(tasks)
-    return task_to_edit
+    return update_task(task_id, apply_edit, owner)
 
-def delete_task_data(task_id):
+def delete_task_data(task_id, owner=None):
     """
     This function deletes a task by its ID.
     """
-    tasks = get_all_tasks()
-    task_to_delete = None
-    for task in tasks:
-        if task["id"] == task_id:
-            task_to_delete = task
-            break
-    
-    if not task_to_delete:
-        return False
-    
-    tasks.remove(task_to_delete)
-    save_tasks(tasks)
-    return True
+    def delete(store):
+        if store.get(task_id) is None:
+            return False
+        store.delete(task_id)
+        return True
 
-def get_task_by_id(task_id):
+    return _partitions(owner).writes.submit(delete)
+
+def get_task_by_id(task_id, owner=None):
     """
-    This function retrieves a task by its ID.
+    This function retrieves a task by its ID using the task store's ID index.
     """
-    tasks = get_all_tasks()
-    for task in tasks:
-        if task["id"] == task_id:
-            return task
-    return None
+    task = _partitions(owner).store.get(task_id)
+    return thaw(task) if task is not None else None
 
-def start_time_tracking(task_id):
+def start_time_tracking(task_id, owner=None):
     """
     This function starts time tracking for a task.
+
+    The session's start is kept in "tracking_started_at" as well as in a new open time entry.
     """
-    task = get_task_by_id(task_id)
-    if not task:
-        return False
-    
-    if task.get("is_tracking", False):
-        return False # Already tracking
-
-    task["is_tracking"] = True
-    task.setdefault("time_entries", []).append({
-        "start_time": datetime.now().isoformat(),
-        "end_time": None
-    })
-    
-    tasks = get_all_tasks()
-    for i, t in enumerate(tasks):
-        if t["id"] == task_id:
-            tasks[i] = task
-            break
-    save_tasks(tasks)
-    return True
+    def start(task):
+        if task.get("is_tracking", False):
+            return False # Already tracking
+
+        started_at = datetime.now().isoformat()
+        task["is_tracking"] = True
+        task["tracking_started_at"] = started_at
+        task.setdefault("time_entries", []).append({
+            "start_time": started_at,
+            "end_time": None
+        })
 
-def stop_time_tracking(task_id):
+    return update_task(task_id, start, owner) is not None
+
+def stop_time_tracking(task_id, owner=None):
     """
     This function stops time tracking for a task.
+
+    The finished session is added to the task's running "tracked_seconds" total, so the
+    time spent on a task is read from one field instead of summing its time entries.
     """
-    task = get_task_by_id(task_id)
-    if not task or not task.get("is_tracking", False):
-        return False
+    def stop(task):
+        if not task.get("is_tracking", False):
+            return False
+
+        now = datetime.now()
+        time_entries = task.get("time_entries") or []
+        if task.get("tracked_seconds") is None:
+            task["tracked_seconds"] = sum_finished_seconds(time_entries) # Task saved before totals were kept
+        started_at = task.get("tracking_started_at")
+        if not started_at and time_entries and not time_entries[-1]["end_time"]:
+            started_at = time_entries[-1]["start_time"]
+        if started_at:
+            session_seconds = (now - datetime.fromisoformat(started_at)).total_seconds()
+            task["tracked_seconds"] = round(task["tracked_seconds"] + session_seconds, 6)
+
+        task["is_tracking"] = False
+        task["tracking_started_at"] = None
+        if time_entries and not time_entries[-1]["end_time"]:
+            time_entries[-1]["end_time"] = now.isoformat()
+
+    return update_task(task_id, stop, owner) is not None
+
+def backfill_tracked_time(owner=None):
+    """
+    This function recomputes every task's "tracked_seconds" total and "tracking_started_at"
+    from its time entries, e.g. for tasks saved before the totals were kept.
 
-    task["is_tracking"] = False
-    if task["time_entries"]:
-        task["time_entries"][-1]["end_time"] = datetime.now().isoformat()
-    
-    tasks = get_all_tasks()
-    for i, t in enumerate(tasks):
-        if t["id"] == task_id:
-            tasks[i] = task
-            break
-    save_tasks(tasks)
-    return True
+    Only tasks whose values change are written, in one batch.
+
+    Returns:
+        The number of tasks that were updated.
+    """
+    store = _partitions(owner).store
+    with store.exclusive():
+        updated = []
+        for task in store.records():
+            time_entries = task.get("time_entries") or ()
+            open_entry = time_entries[-1] if time_entries and time_entries[-1]["end_time"] is None else None
+            fields = {
+                "tracked_seconds": sum_finished_seconds(time_entries),
+                "tracking_started_at": open_entry["start_time"] if task.get("is_tracking") and open_entry else None,
+            }
+            if any(name not in task or task[name] != value for name, value in fields.items()):
+                updated.append(task.replace(**fields))
+        store.apply(updated)
+    return len(updated)
 
 def add_task():
     """
@@ -268,6 +481,7 @@ def list_tasks():
     """
     This function lists all tasks in a table.
     """
+    materialize_recurring_tasks()
     tasks = get_all_tasks()
     if not tasks:
         console.print("[bold yellow]No tasks found.[/bold yellow]")
@@ -298,8 +512,7 @@ def edit_task():
     """
     This function edits an existing task.
     """
-    tasks = get_all_tasks()
-    if not tasks:
+    if not get_task_views():
         console.print("[bold yellow]No tasks to edit.[/bold yellow]")
         return
 
@@ -311,11 +524,7 @@ def edit_task():
         return
 
     task_id = int(task_id_str)
-    task_to_edit = None
-    for task in tasks:
-        if task["id"] == task_id:
-            task_to_edit = task
-            break
+    task_to_edit = get_task_by_id(task_id)
 
     if not task_to_edit:
         console.print("[bold red]Task not found.[/bold red]")
@@ -388,8 +597,7 @@ def delete_task():
     """
     This function deletes a task.
     """
-    tasks = get_all_tasks()
-    if not tasks:
+    if not get_task_views():
         console.print("[bold yellow]No tasks to delete.[/bold yellow]")
         return
 
@@ -401,11 +609,7 @@ def delete_task():
         return
 
     task_id = int(task_id_str)
-    task_to_delete = None
-    for task in tasks:
-        if task["id"] == task_id:
-            task_to_delete = task
-            break
+    task_to_delete = get_task_by_id(task_id)
 
     if not task_to_delete:
         console.print("[bold red]Task not found.[/bold red]")
@@ -423,20 +627,18 @@ def search_and_filter_tasks():
     """
     This function allows searching and filtering tasks.
     """
-    tasks = get_all_tasks()
-    if not tasks:
+    materialize_recurring_tasks()
+    if not get_task_views():
         console.print("[bold yellow]No tasks to search or filter.[/bold yellow]")
         return
 
-    filtered_tasks = tasks
+    filters = {}
 
-    search_title = questionary.text("Enter title to search (leave empty to skip):").ask()
-    if search_title:
-        filtered_tasks = [task for task in filtered_tasks if search_title.lower() in task['title'].lower()]
+    search_text = questionary.text("Enter text to search in titles, descriptions and tags (leave empty to skip):").ask()
 
     filter_category = questionary.text("Enter category to filter by (leave empty to skip):").ask()
     if filter_category:
-        filtered_tasks = [task for task in filtered_tasks if filter_category.lower() == task['category'].lower()]
+        filters["category"] = filter_category
 
     filter_priority = questionary.select(
         "Filter by priority (leave empty to skip):",
@@ -444,7 +646,7 @@ def search_and_filter_tasks():
         default="Skip"
     ).ask()
     if filter_priority != "Skip":
-        filtered_tasks = [task for task in filtered_tasks if filter_priority == task['priority']]
+        filters["priority"] = filter_priority
 
     filter_status = questionary.select(
         "Filter by status (leave empty to skip):",
@@ -452,11 +654,18 @@ def search_and_filter_tasks():
         default="Skip"
     ).ask()
     if filter_status != "Skip":
-        filtered_tasks = [task for task in filtered_tasks if filter_status == task['status']]
+        filters["status"] = filter_status
 
     filter_tag = questionary.text("Enter tag to filter by (leave empty to skip):").ask()
     if filter_tag:
-        filtered_tasks = [task for task in filtered_tasks if any(filter_tag.lower() == t.lower() for t in task['tags'])]
+        filters["tag"] = filter_tag
+
+    # Category matching has always ignored case; priority and status come from fixed choices.
+    if search_text:
+        matching_ids = find_task_ids(ignore_case=True, **filters)
+        filtered_tasks = [task for task in search_tasks(search_text, limit=None) if task['id'] in matching_ids]
+    else:
+        filtered_tasks = filter_tasks(ignore_case=True, **filters)
 
     if not filtered_tasks:
         console.print("[bold yellow]No tasks found matching your criteria.[/bold yellow]")
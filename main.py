@@ -1,10 +1,15 @@
 import subprocess
 import sys
+from features.reminders.reminders import start_reminder_schedulers
+from features.reminders.scheduler import ConsoleSink
 
 def main():
     """
     Main function to run the Task Manager Streamlit app.
+
+    The reminder scheduler runs alongside it in this process and fire due reminders.
     """
+    start_reminder_schedulers([ConsoleSink()])
     try:
         subprocess.run([sys.executable, "-m", "streamlit", "run", "streamlit_app/dashboard.py"])
     except FileNotFoundError:
@@ -1,17 +1,24 @@
+import heapq
 import streamlit as st
 import altair as alt
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 from features.tasks import tasks as tasks_manager
 from features.reminders import reminders as reminders_manager
 from features.categories import categories as categories_manager
-from features.analytics import analytics
-from streamlit_app.time_helper import get_total_time_spent
+from streamlit_app.time_helper import get_task_time_spent
+from streamlit_app import data_access
 from features.export import export
 from features import auth
 
 st.set_page_config(layout="wide", page_title="Task Manager", page_icon="✅")
 
+# Cards shown per Kanban column before "Load more".
+KANBAN_PAGE_SIZE = 20
+# How far ahead the sidebar's "Upcoming" widget looks.
+UPCOMING_REMINDER_HOURS = 24
+UPCOMING_TASK_DAYS = 7
+
 def show_login_page():
     st.title("Login / Sign Up")
 
@@ -22,13 +29,22 @@ def show_login_page():
             login_submitted = st.form_submit_button("Login")
 
             if login_submitted:
-                if auth.authenticate_user(username, password):
-                    st.session_state['logged_in'] = True
-                    st.session_state['username'] = username
-                    st.success("Logged in successfully!")
-                    st.rerun()
+                retry_after = auth.login_retry_after(username)
+                if retry_after:
+                    st.error(f"Too many failed attempts. Try again in {int(retry_after) + 1} seconds.")
                 else:
-                    st.error("Invalid username or password.")
+                    try:
+                        authenticated = auth.authenticate_user(username, password)
+                    except auth.AuthBusyError as e:
+                        st.error(str(e))
+                    else:
+                        if authenticated:
+                            # main() logs the session in from the token on this and every later run.
+                            st.session_state['session_token'] = auth.create_session_token(username)
+                            st.success("Logged in successfully!")
+                            st.rerun()
+                        else:
+                            st.error("Invalid username or password.")
 
     with st.expander("Sign Up", expanded=False):
         with st.form("signup_form"):
@@ -37,20 +53,27 @@ def show_login_page():
             signup_submitted = st.form_submit_button("Sign Up")
 
             if signup_submitted:
-                if auth.user_exists(new_username):
-                    st.error("Username already taken. Please choose a different one.")
-                else:
+                try:
                     if auth.register_user(new_username, new_password):
                         st.success("Account created successfully! Please log in.")
                     else:
-                        st.error("Failed to create account.")
+                        st.error("Username already taken. Please choose a different one.")
+                except (ValueError, auth.AuthBusyError) as e:
+                    st.error(str(e))
 
 def show_main_app():
+    # Every read and write below is scoped to the logged-in user's own data.
+    owner = st.session_state['username']
+    tasks_manager.materialize_recurring_tasks(owner=owner)
+    # Due reminders are fired by the scheduler main.py runs, which picks up new users by itself.
     st.title(f"✅ Task Manager - Welcome, {st.session_state['username']}!")
     
     col1, col2, col3 = st.columns([0.8, 0.1, 0.1])
     with col3:
         if st.button("Logout"):
+            # Revoked on the server too, so the token is worthless even if it leaked.
+            auth.end_sessions(owner)
+            st.session_state['session_token'] = None
             st.session_state['logged_in'] = False
             st.session_state['username'] = None
             st.rerun()
@@ -59,32 +82,33 @@ def show_main_app():
     
     menu = ["✍️ Tasks", "⏰ Reminders", "📂 Categories", "📊 Analytics", "📤 Export"]
     choice = st.sidebar.selectbox("Menu", menu)
+    display_upcoming(owner)
 
     if choice == "✍️ Tasks":
         st.header("Task Management")
-        display_tasks()
+        display_tasks(owner)
     elif choice == "⏰ Reminders":
         st.header("Reminder Management")
-        display_reminders()
+        display_reminders(owner)
     elif choice == "📂 Categories":
         st.header("Category Management")
-        display_categories_and_summary()
+        display_categories_and_summary(owner)
     elif choice == "📊 Analytics":
         st.header("Productivity Analytics")
-        display_analytics()
+        display_analytics(owner)
     elif choice == "📤 Export":
         st.header("Export Data")
-        display_export_options()
+        display_export_options(owner)
 
 import uuid
 
-def display_tasks():
+def display_tasks(owner):
     with st.expander("➕ Add New Task", expanded=False):
         with st.form("add_task_form", clear_on_submit=True):
             title = st.text_input("Title")
             description = st.text_area("Description")
             
-            categories = [cat['name'] for cat in categories_manager.get_all_categories()]
+            categories = data_access.get_category_names(owner)
             category = st.selectbox("Category", [""] + categories)
 
             priority = st.selectbox("Priority", ["Low", "Medium", "High", "Critical"])
@@ -101,31 +125,50 @@ def display_tasks():
                 tags_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
                 tasks_manager.add_task_data(
                     title, description, category, priority, deadline, tags_list, 
-                    is_recurring, recurrence_rule
+                    is_recurring, recurrence_rule, owner=owner
                 )
                 st.success(f"Task '{title}' added!")
                 st.rerun()
 
+    search_query = st.text_input("🔍 Search tasks", placeholder="Search titles, descriptions and tags")
+    if search_query:
+        results = tasks_manager.search_tasks(search_query, limit=20, owner=owner)
+        if results:
+            for task in results:
+                st.markdown(f"**{task['title']}** · {task['status']} · {task['category']} · Priority: {task['priority']}")
+        else:
+            st.info("No tasks match your search.")
+
     st.subheader("📝 Task Board")
     
-    all_tasks = tasks_manager.get_all_tasks()
-    
     # Define Kanban columns
     statuses = ["Pending", "In Progress", "Completed"]
+    category_names = data_access.get_category_names(owner)
     kanban_cols = st.columns(len(statuses))
 
-    # Group tasks by status
-    tasks_by_status = {status: [] for status in statuses}
-    for task in all_tasks:
-        if task['status'] not in statuses:
-            task['status'] = "Pending"
-        tasks_by_status[task['status']].append(task)
+    # Group task IDs by status; tasks with an unknown status are shown as Pending
+    ids_by_status = {status: tasks_manager.find_task_ids(status=status, owner=owner) for status in statuses}
+    for other_status in tasks_manager.count_tasks_by("status", owner):
+        if other_status not in statuses:
+            ids_by_status["Pending"] |= tasks_manager.find_task_ids(status=other_status, owner=owner)
         
     for i, status in enumerate(statuses):
         with kanban_cols[i]:
-            st.markdown(f"**{status}** ({len(tasks_by_status[status])})")
+            column_ids = ids_by_status[status]
+            page_size_key = f"kanban_page_size_{status}"
+            page_size = st.session_state.get(page_size_key, KANBAN_PAGE_SIZE)
+            st.markdown(f"**{status}** ({len(column_ids)})")
             st.markdown("---")
-            for task in sorted(tasks_by_status[status], key=lambda x: x['id'], reverse=True):
+
+            # Only the newest page_size cards of the column are loaded and rendered
+            page_ids = heapq.nlargest(page_size, column_ids)
+            page_tasks = {task['id']: task for task in tasks_manager.get_task_views_by_ids(page_ids, owner)}
+            for task_id in page_ids:
+                task = page_tasks.get(task_id)
+                if task is None:
+                    continue # Deleted by another session since the IDs were looked up
+                if task['status'] not in statuses:
+                    task = task.replace(status="Pending")
                 with st.container(border=True):
                     st.markdown(f"**{task['title']}**")
                     
@@ -134,27 +177,27 @@ def display_tasks():
                     if status == "Pending":
                         with col1_status:
                             if st.button("▶️", key=f"start_{task['id']}"):
-                                tasks_manager.edit_task_data(task['id'], task['title'], task['description'], task['category'], task['priority'], task['deadline'], "In Progress", task['tags'], task.get('is_recurring'), task.get('recurrence_rule'))
+                                tasks_manager.set_task_status(task['id'], "In Progress", owner)
                                 st.rerun()
                     elif status == "In Progress":
                         with col1_status:
                             if st.button("↩️", key=f"back_{task['id']}"):
-                                tasks_manager.edit_task_data(task['id'], task['title'], task['description'], task['category'], task['priority'], task['deadline'], "Pending", task['tags'], task.get('is_recurring'), task.get('recurrence_rule'))
+                                tasks_manager.set_task_status(task['id'], "Pending", owner)
                                 st.rerun()
                         with col2_status:
                             if st.button("✔", key=f"complete_{task['id']}"):
-                                tasks_manager.edit_task_data(task['id'], task['title'], task['description'], task['category'], task['priority'], task['deadline'], "Completed", task['tags'], task.get('is_recurring'), task.get('recurrence_rule'))
+                                tasks_manager.set_task_status(task['id'], "Completed", owner)
                                 st.rerun()
                     elif status == "Completed":
                         with col1_status:
                             if st.button("🔄", key=f"reopen_{task['id']}"):
-                                tasks_manager.edit_task_data(task['id'], task['title'], task['description'], task['category'], task['priority'], task['deadline'], "Pending", task['tags'], task.get('is_recurring'), task.get('recurrence_rule'))
+                                tasks_manager.set_task_status(task['id'], "Pending", owner)
                                 st.rerun()
 
                     # Add delete button here
                     with col3_status:
                         if st.button("❌", key=f"delete_btn_quick_{task['id']}"):
-                            tasks_manager.delete_task_data(task['id'])
+                            tasks_manager.delete_task_data(task['id'], owner)
                             st.warning(f"Task ID '{task['id']}' deleted!")
                             st.rerun()
 
@@ -163,22 +206,24 @@ def display_tasks():
                     if task['deadline']:
                         st.write(f"Deadline: {task['deadline']}")
                     
-                    time_spent = get_total_time_spent(task.get("time_entries", []))
+                    time_spent = get_task_time_spent(task)
                     st.write(f"**Time Spent:** {time_spent}")
 
                     if task.get("is_tracking", False):
                         if st.button("⏹️ Stop Tracking", key=f"stop_track_{task['id']}"):
-                            tasks_manager.stop_time_tracking(task['id'])
+                            tasks_manager.stop_time_tracking(task['id'], owner)
                             st.rerun()
                     else:
                         if st.button("▶️ Start Tracking", key=f"start_track_{task['id']}"):
-                            tasks_manager.start_time_tracking(task['id'])
+                            tasks_manager.start_time_tracking(task['id'], owner)
                             st.rerun()
 
                     with st.expander("Details & Actions"):
                         st.write(f"Description: {task['description']}")
                         st.write(f"Category: {task['category']}")
                         st.write(f"Tags: {', '.join(task['tags'])}")
+                        for reminder in reminders_manager.reminders_for_task(task['id'], owner):
+                            st.write(f"🔔 {reminder['remind_at']} - {reminder['message']}")
 
                         if st.button("✏️ Edit Task", key=f"edit_btn_{task['id']}"):
                             st.session_state[f"edit_mode_{task['id']}"] = True
@@ -187,11 +232,9 @@ def display_tasks():
                             with st.form(f"edit_task_{task['id']}"):
                                 new_title = st.text_input("Title", value=task['title'], key=f"edit_title_{task['id']}")
                                 new_description = st.text_area("Description", value=task['description'], key=f"edit_desc_{task['id']}")
-                                new_category = st.selectbox("Category", [task['category']] + [cat['name'] for cat in categories_manager.get_all_categories() if cat['name'] != task['category']], key=f"edit_cat_{task['id']}")
+                                new_category = st.selectbox("Category", [task['category']] + [name for name in category_names if name != task['category']], key=f"edit_cat_{task['id']}")
                                 new_priority = st.selectbox("Priority", ["Low", "Medium", "High", "Critical"], index=["Low", "Medium", "High", "Critical"].index(task['priority']), key=f"edit_prio_{task['id']}")
-                                new_deadline_val = None
-                                if task['deadline']:
-                                    new_deadline_val = datetime.strptime(task['deadline'], "%Y-%m-%d").date()
+                                new_deadline_val = task.deadline_date
                                 new_deadline = st.date_input("Deadline", value=new_deadline_val, key=f"edit_ddl_{task['id']}")
                                 new_status = st.selectbox("Status", statuses, index=statuses.index(task['status']), key=f"edit_stat_{task['id']}")
                                 new_tags = st.text_input("Tags", value=", ".join(task['tags']), key=f"edit_tags_{task['id']}")
@@ -210,51 +253,78 @@ def display_tasks():
                                         tasks_manager.edit_task_data(
                                             task['id'], new_title, new_description, new_category, new_priority, 
                                             new_deadline, new_status, new_tags_list,
-                                            new_is_recurring, new_recurrence_rule
+                                            new_is_recurring, new_recurrence_rule, owner=owner
                                         )
                                         st.session_state[f"edit_mode_{task['id']}"] = False
                                         st.success(f"Task '{new_title}' updated!")
                                         st.rerun()
 
-def display_reminders():
+            remaining = len(column_ids) - len(page_ids)
+            if remaining > 0:
+                if st.button(f"Load more ({remaining} more)", key=f"load_more_{status}"):
+                    st.session_state[page_size_key] = page_size + KANBAN_PAGE_SIZE
+                    st.rerun()
+
+def display_upcoming(owner):
+    # Both lists are range queries on the sorted time indexes, so they only read the items shown.
+    now = datetime.now()
+    upcoming_reminders = reminders_manager.reminders_between(now, now + timedelta(hours=UPCOMING_REMINDER_HOURS), owner)
+    upcoming_tasks = tasks_manager.tasks_due_between(now.date(), now.date() + timedelta(days=UPCOMING_TASK_DAYS), owner=owner)
+
+    st.sidebar.subheader("🗓️ Upcoming")
+    if not upcoming_reminders and not upcoming_tasks:
+        st.sidebar.caption("Nothing coming up.")
+        return
+    for reminder in upcoming_reminders:
+        st.sidebar.write(f"🔔 {reminder['remind_at']} - {reminder['message']}")
+    for task in upcoming_tasks:
+        st.sidebar.write(f"📌 {task['deadline']} - {task['title']} ({task['priority']})")
+
+def display_reminders(owner):
     with st.expander("➕ Add New Reminder", expanded=False):
         with st.form("add_reminder_form", clear_on_submit=True):
             message = st.text_input("Reminder Message")
             reminder_date = st.date_input("Reminder Date", value=datetime.now().date())
             reminder_time = st.time_input("Reminder Time", value=datetime.now().time())
+            task_id = st.number_input("Task ID (optional)", min_value=1, step=1, value=None)
 
             submitted = st.form_submit_button("Add Reminder")
             if submitted:
+                if task_id is not None and tasks_manager.get_task_by_id(int(task_id), owner) is None:
+                    st.error(f"Task ID '{int(task_id)}' not found.")
+                    return
                 remind_at = datetime.combine(reminder_date, reminder_time)
-                reminders_manager.add_reminder_data(message, remind_at)
+                reminders_manager.add_reminder_data(message, remind_at, int(task_id) if task_id is not None else None, owner)
                 st.success(f"Reminder '{message}' added!")
                 st.rerun()
 
     st.subheader("🔔 Your Reminders")
-    all_reminders = reminders_manager.get_all_reminders()
+    all_reminders = data_access.get_reminders(owner)
     if all_reminders:
         for reminder in sorted(all_reminders, key=lambda x: x['id'], reverse=True):
             with st.container(border=True): # Use border for visual separation
                 st.markdown(f"### {reminder['message']}")
                 st.write(f"**Remind At:** {reminder['remind_at']}")
+                if reminder.get('task_id') is not None:
+                    st.write(f"**Task:** {reminder['task_id']}")
                 
                 col1_del, col2_del = st.columns(2)
                 with col1_del:
                     if st.button(f"Delete Reminder {reminder['id']}", key=f"del_rem_{reminder['id']}"):
-                        reminders_manager.delete_reminder_data(reminder['id'])
+                        reminders_manager.delete_reminder_data(reminder['id'], owner)
                         st.warning(f"Reminder ID '{reminder['id']}' deleted!")
                         st.rerun()
                 st.markdown("---")
     else:
         st.info("No reminders yet.")
 
-def display_categories_and_summary():
+def display_categories_and_summary(owner):
     with st.expander("➕ Add New Category", expanded=False):
         with st.form("add_category_form", clear_on_submit=True):
             name = st.text_input("Category Name")
             submitted = st.form_submit_button("Add Category")
             if submitted:
-                new_cat, msg = categories_manager.create_category_data(name)
+                new_cat, msg = categories_manager.create_category_data(name, owner)
                 if new_cat:
                     st.success(msg)
                     st.rerun()
@@ -262,18 +332,16 @@ def display_categories_and_summary():
                     st.error(msg)
     
     st.subheader("🗂️ All Categories")
-    all_categories = categories_manager.get_all_categories()
+    all_categories = data_access.get_categories(owner)
     if all_categories:
         df = pd.DataFrame(all_categories)
         st.dataframe(df, use_container_width=True)
         
         st.subheader("Category Summary")
-        all_tasks = tasks_manager.get_all_tasks()
         category_summary_data = []
         for cat in all_categories:
-            category_tasks = [task for task in all_tasks if task['category'] == cat['name']]
-            total_tasks = len(category_tasks)
-            completed_tasks = len([task for task in category_tasks if task['status'] == 'Completed'])
+            total_tasks = tasks_manager.count_tasks(category=cat['name'], owner=owner)
+            completed_tasks = tasks_manager.count_tasks(category=cat['name'], status='Completed', owner=owner)
             pending_tasks = total_tasks - completed_tasks
             category_summary_data.append({
                 "Category": cat['name'],
@@ -289,9 +357,9 @@ def display_categories_and_summary():
 
 import altair as alt
 
-def display_analytics():
+def display_analytics(owner):
     st.subheader("Basic Analytics")
-    analytics_data = analytics.get_productivity_analytics()
+    analytics_data = data_access.get_productivity_analytics(owner)
     
     if not analytics_data:
         st.info("No tasks found for analytics.")
@@ -332,7 +400,7 @@ def display_analytics():
         st.altair_chart(category_chart, use_container_width=True)
     
     st.subheader("Advanced Time Analytics")
-    advanced_analytics_data = analytics.get_advanced_analytics()
+    advanced_analytics_data = data_access.get_advanced_analytics(owner)
     if not advanced_analytics_data:
         st.info("No time tracking data available for advanced analytics.")
         return
@@ -394,12 +462,11 @@ def display_analytics():
         )
         st.altair_chart(hour_chart, use_container_width=True)
 
-def display_export_options():
+def display_export_options(owner):
     st.subheader("Export Tasks")
     if st.button("Export Tasks to CSV"):
-        all_tasks = tasks_manager.get_all_tasks()
-        if all_tasks:
-            csv_data = pd.DataFrame(all_tasks).to_csv(index=False)
+        csv_data = data_access.export_tasks(owner, "csv")
+        if csv_data:
             st.download_button(
                 label="Download Tasks CSV",
                 data=csv_data,
@@ -407,9 +474,8 @@ def display_export_options():
                 mime="text/csv",
             )
     if st.button("Export Tasks to JSON"):
-        all_tasks = tasks_manager.get_all_tasks()
-        if all_tasks:
-            json_data = pd.DataFrame(all_tasks).to_json(orient="records", indent=4)
+        json_data = data_access.export_tasks(owner, "json")
+        if json_data:
             st.download_button(
                 label="Download Tasks JSON",
                 data=json_data,
@@ -419,9 +485,8 @@ def display_export_options():
 
     st.subheader("Export Reminders")
     if st.button("Export Reminders to CSV"):
-        all_reminders = reminders_manager.get_all_reminders()
-        if all_reminders:
-            csv_data = pd.DataFrame(all_reminders).to_csv(index=False)
+        csv_data = data_access.export_reminders(owner, "csv")
+        if csv_data:
             st.download_button(
                 label="Download Reminders CSV",
                 data=csv_data,
@@ -429,9 +494,8 @@ def display_export_options():
                 mime="text/csv",
             )
     if st.button("Export Reminders to JSON"):
-        all_reminders = reminders_manager.get_all_reminders()
-        if all_reminders:
-            json_data = pd.DataFrame(all_reminders).to_json(orient="records", indent=4)
+        json_data = data_access.export_reminders(owner, "json")
+        if json_data:
             st.download_button(
                 label="Download Reminders JSON",
                 data=json_data,
@@ -440,9 +504,16 @@ def display_export_options():
             )
 
 def main():
-    if 'logged_in' not in st.session_state:
-        st.session_state['logged_in'] = False
-        st.session_state['username'] = None
+    # The signed token is kept server-side in the session state, never in the URL, and
+    # keeps the user logged in across reruns and reconnects of the same browser session.
+    # Checking it is an HMAC, not a bcrypt check, and a token that has expired or was
+    # revoked by a logout elsewhere logs the session out.
+    token = st.session_state.get('session_token')
+    username = auth.verify_session_token(token) if token else None
+    if token and username is None:
+        st.session_state['session_token'] = None
+    st.session_state['logged_in'] = username is not None
+    st.session_state['username'] = username
 
     if st.session_state['logged_in']:
         show_main_app()
@@ -0,0 +1,96 @@
+import streamlit as st
+import pandas as pd
+from features.analytics import analytics
+from features.categories import categories as categories_manager
+from features.reminders import reminders as reminders_manager
+from features.tasks import tasks as tasks_manager
+
+# Cached reads for the dashboard.
+#
+# Every function reads the data of one owner, the logged-in user. Every cached function
+# takes the owner and the version token of the owner's store it reads from. The token
+# changes whenever that store's records change, whether a dashboard action or another
+# process changed them, so a rerun reuses the cached result until then. Mutations go
+# through the feature modules as before; they bump the token by changing the store.
+#
+# Every write leaves the entries for older tokens behind, so each function keeps at most
+# CACHE_MAX_ENTRIES results (the least recently used go first) and drops any result
+# after CACHE_TTL_SECONDS.
+CACHE_MAX_ENTRIES = 64
+CACHE_TTL_SECONDS = 3600
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def _load_categories(owner, version):
+    return categories_manager.get_all_categories(owner)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def _load_reminders(owner, version):
+    return reminders_manager.get_all_reminders(owner)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def _load_productivity_analytics(owner, version):
+    return analytics.get_productivity_analytics(owner)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def _load_advanced_analytics(owner, version):
+    return analytics.get_advanced_analytics(owner)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def _export_tasks(owner, version, file_format):
+    all_tasks = tasks_manager.get_all_tasks(owner)
+    if not all_tasks:
+        return None
+    if file_format == "csv":
+        return pd.DataFrame(all_tasks).to_csv(index=False)
+    return pd.DataFrame(all_tasks).to_json(orient="records", indent=4)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def _export_reminders(owner, version, file_format):
+    all_reminders = reminders_manager.get_all_reminders(owner)
+    if not all_reminders:
+        return None
+    if file_format == "csv":
+        return pd.DataFrame(all_reminders).to_csv(index=False)
+    return pd.DataFrame(all_reminders).to_json(orient="records", indent=4)
+
+def get_categories(owner):
+    """
+    Returns all of the owner's categories, loading them only when their store changed.
+    """
+    return _load_categories(owner, categories_manager.get_categories_version(owner))
+
+def get_category_names(owner):
+    """
+    Returns the names of all of the owner's categories.
+    """
+    return [category['name'] for category in get_categories(owner)]
+
+def get_reminders(owner):
+    """
+    Returns all of the owner's reminders, loading them only when their store changed.
+    """
+    return _load_reminders(owner, reminders_manager.get_reminders_version(owner))
+
+def get_productivity_analytics(owner):
+    """
+    Returns analytics.get_productivity_analytics(owner), recomputed only when the owner's tasks changed.
+    """
+    return _load_productivity_analytics(owner, tasks_manager.get_tasks_version(owner))
+
+def get_advanced_analytics(owner):
+    """
+    Returns analytics.get_advanced_analytics(owner), recomputed only when the owner's tasks changed.
+    """
+    return _load_advanced_analytics(owner, tasks_manager.get_tasks_version(owner))
+
+def export_tasks(owner, file_format):
+    """
+    Returns all of the owner's tasks as "csv" or "json" text, or None if there are none.
+    """
+    return _export_tasks(owner, tasks_manager.get_tasks_version(owner), file_format)
+
+def export_reminders(owner, file_format):
+    """
+    Returns all of the owner's reminders as "csv" or "json" text, or None if there are none.
+    """
+    return _export_reminders(owner, reminders_manager.get_reminders_version(owner), file_format)
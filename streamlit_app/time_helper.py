@@ -1,14 +1,19 @@
+from datetime import datetime
 
-from datetime import datetime, timedelta
-
-def get_total_time_spent(time_entries):
-    total_seconds = 0
-    for entry in time_entries:
-        start = datetime.fromisoformat(entry["start_time"])
-        end = datetime.fromisoformat(entry["end_time"]) if entry["end_time"] else datetime.now()
-        total_seconds += (end - start).total_seconds()
-    
+def _format_duration(total_seconds):
     hours = int(total_seconds // 3600)
     minutes = int((total_seconds % 3600) // 60)
     seconds = int(total_seconds % 60)
     return f"{hours}h {minutes}m {seconds}s"
+
+def get_task_time_spent(task):
+    """
+    Returns the formatted time spent on a task for its Kanban card.
+
+    The finished sessions come from the task's running total; only a running session
+    is measured again on each rerun.
+    """
+    total_seconds = task.finished_seconds
+    if task.session_start:
+        total_seconds += (datetime.now() - task.session_start).total_seconds()
+    return _format_duration(total_seconds)
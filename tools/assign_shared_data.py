@@ -0,0 +1,39 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The feature modules open their data files relative to the repository root.
+os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+
+from features.categories import categories
+from features.reminders import reminders
+from features.tasks import tasks
+
+def assign(owner):
+    """
+    Copies the shared tasks, reminders and categories (the data from before per-user
+    partitioning) into one user's shard, keeping their IDs. The shared files are left
+    as they are. A user whose shard already has data is skipped so nothing is overwritten.
+    """
+    if tasks.get_all_tasks(owner) or reminders.get_all_reminders(owner) or categories.get_all_categories(owner):
+        print(f"{owner} already has data of their own; nothing copied.")
+        return
+
+    # Reminders first: saving the tasks regenerates the deadline reminders on top of them.
+    shared_reminders = reminders.get_all_reminders()
+    reminders.save_reminders(shared_reminders, owner=owner)
+    shared_categories = categories.get_all_categories()
+    categories.save_categories(shared_categories, owner=owner)
+    shared_tasks = tasks.get_all_tasks()
+    tasks.save_tasks(shared_tasks, owner=owner)
+    reminders.sync_deadline_reminders(owner)
+
+    print(f"Copied {len(shared_tasks)} task(s), {len(shared_reminders)} reminder(s) and "
+          f"{len(shared_categories)} categor{'y' if len(shared_categories) == 1 else 'ies'} to {owner}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the shared tasks, reminders and categories into a user's own data.")
+    parser.add_argument("--owner", required=True, help="Username to give the shared data to.")
+    args = parser.parse_args()
+    assign(args.owner)
@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The feature modules open their data files relative to the repository root.
+os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+
+from features.storage.partitions import list_owners
+from features.tasks import tasks
+
+def backfill():
+    """
+    Fills in every task's running "tracked_seconds" total and open session start from
+    its time entries, for the shared tasks and every user's. Running it again only
+    rewrites tasks whose totals are off.
+    """
+    print("Backfilling tracked time totals...")
+    updated = sum(tasks.backfill_tracked_time(owner) for owner in [None, *list_owners()])
+    print(f"Updated {updated} task(s).")
+
+if __name__ == "__main__":
+    backfill()
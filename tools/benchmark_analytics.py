@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from features.analytics.analytics import compute_advanced_analytics, compute_productivity_analytics, results_match
+from features.analytics.frames import AnalyticsFrames
+
+ENTRY_COUNTS = [10_000, 100_000, 1_000_000]
+ENTRIES_PER_TASK = 10
+
+def make_tasks(entry_count, seed=42):
+    """
+    Generates synthetic tasks with ENTRIES_PER_TASK finished time entries each.
+    """
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    tasks = []
+    for task_id in range(1, entry_count // ENTRIES_PER_TASK + 1):
+        start = base + timedelta(minutes=rng.randrange(500_000))
+        time_entries = []
+        for _ in range(ENTRIES_PER_TASK):
+            end = start + timedelta(seconds=rng.randrange(60, 7200), microseconds=rng.randrange(1_000_000))
+            time_entries.append({"start_time": start.isoformat(), "end_time": end.isoformat()})
+            start = end + timedelta(minutes=rng.randrange(1, 600))
+        completed = rng.random() < 0.4
+        tasks.append({
+            "id": task_id,
+            "status": "Completed" if completed else rng.choice(["Pending", "In Progress"]),
+            "priority": rng.choice(["Low", "Medium", "High", "Critical"]),
+            "category": rng.choice(["Work", "Home", "Study", "Health", "Errands"]),
+            "completed_at": start.isoformat(timespec="seconds") if completed and rng.random() < 0.8 else None,
+            "time_entries": time_entries,
+        })
+    return tasks
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def benchmark():
+    """
+    Times the loop-based analytics against the vectorised AnalyticsFrames and checks that they agree.
+    """
+    print(f"{'entries':>10} {'loops':>9} {'frames load':>12} {'frames calc':>12} {'match':>6}")
+    for entry_count in ENTRY_COUNTS:
+        tasks = make_tasks(entry_count)
+
+        loop_results, loop_seconds = _timed(lambda: (compute_productivity_analytics(tasks), compute_advanced_analytics(tasks)))
+        frames, load_seconds = _timed(AnalyticsFrames.from_tasks, tasks)
+        frame_results, calc_seconds = _timed(lambda: (frames.productivity_analytics(), frames.advanced_analytics()))
+
+        match = all(results_match(expected, actual) for expected, actual in zip(loop_results, frame_results))
+        print(f"{entry_count:>10} {loop_seconds:>8.3f}s {load_seconds:>11.3f}s {calc_seconds:>11.3f}s {'yes' if match else 'NO':>6}")
+
+if __name__ == "__main__":
+    benchmark()
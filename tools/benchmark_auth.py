@@ -0,0 +1,78 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from features import auth
+
+def _session(username, logins, latencies, busy, lock):
+    """
+    Simulates one user logging in again and again, as a burst of dashboard sessions would.
+    """
+    for _ in range(logins):
+        start = time.perf_counter()
+        try:
+            ok = auth.authenticate_user(username, "password")
+        except auth.AuthBusyError:
+            with lock:
+                busy.append(1)
+            continue
+        if not ok:
+            raise RuntimeError(f"Login failed for {username}")
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+def run(rounds, workers, max_pending, sessions, logins):
+    auth.configure_hashing(rounds=rounds, workers=workers, max_pending=max_pending)
+    usernames = [f"user-{rounds}-{index}" for index in range(sessions)]
+    for username in usernames:
+        auth.register_user(username, "password")
+
+    latencies, busy, lock = [], [], threading.Lock()
+    threads = [threading.Thread(target=_session, args=(username, logins, latencies, busy, lock)) for username in usernames]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0
+    print(f"cost {rounds:>2}  workers {workers:>2}  pending {max_pending:>3}  {len(latencies) / elapsed:>8.1f} logins/s  "
+          f"p99 {p99:>8.1f} ms  busy {len(busy)}")
+
+def benchmark(costs, worker_counts, sessions, logins, max_pending):
+    """
+    Logs sessions users in concurrently, logins times each, for every combination of
+    bcrypt cost and hashing pool size, and prints logins per second, p99 login latency
+    and how many logins were turned away with AuthBusyError.
+    """
+    data_dir = tempfile.mkdtemp(prefix="task-manager-auth-")
+    os.makedirs(os.path.join(data_dir, "database"))
+    previous_dir = os.getcwd()
+    # The user store opens its files relative to the working directory.
+    os.chdir(data_dir)
+    try:
+        print(f"{sessions} sessions x {logins} logins")
+        for rounds in costs:
+            for workers in worker_counts:
+                run(rounds, workers, max_pending or 4 * workers, sessions, logins)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure logins per second at different bcrypt costs and hashing pool sizes.")
+    parser.add_argument("--costs", type=int, nargs="+", default=[4, 8, 10, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 2}))
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=5, help="Logins per session.")
+    parser.add_argument("--max-pending", type=int, help="Hashes allowed to run or wait (default: 4 per worker).")
+    args = parser.parse_args()
+    benchmark(args.costs, args.workers, args.sessions, args.logins, args.max_pending)
@@ -0,0 +1,76 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from features.storage.group_commit import MAX_BATCH, MAX_DELAY_SECONDS, WriteCoordinator
+from features.storage.store import get_store
+from features.tasks.records import Task
+
+def _session(coordinator, session_index, operations):
+    """
+    Simulates one dashboard session: adds a task, then moves it across the board and
+    toggles time tracking on it, each click being one submitted write.
+    """
+    def insert(store):
+        task_id = store.next_id()
+        store.upsert({"id": task_id, "title": f"session {session_index}", "status": "Pending", "time_entries": [], "is_tracking": False})
+        return task_id
+
+    task_id = coordinator.submit(insert)
+    for i in range(operations - 1):
+        if i % 2 == 0:
+            status = ("In Progress", "Completed", "Pending")[i // 2 % 3]
+            coordinator.submit(lambda store: store.patch(task_id, {"status": status}))
+        else:
+            def toggle(task):
+                task["is_tracking"] = not task["is_tracking"]
+                if task["is_tracking"]:
+                    task["time_entries"].append({"start_time": "2026-01-01T09:00:00", "end_time": None})
+                else:
+                    task["time_entries"][-1]["end_time"] = "2026-01-01T09:30:00"
+            coordinator.submit(lambda store: store.update(task_id, toggle))
+
+def run(name, sessions, operations, max_delay, max_batch):
+    store = get_store(f"database/{name}.txt", record_type=Task)
+    coordinator = WriteCoordinator(store, max_delay=max_delay, max_batch=max_batch)
+    threads = [threading.Thread(target=_session, args=(coordinator, index, operations)) for index in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = coordinator.stats()
+    print(f"{name:<18} {stats['operations'] / elapsed:>8.0f} ops/s  {stats['fsyncs_per_second']:>7.0f} fsyncs/s  "
+          f"{stats['operations_per_commit']:>5.1f} ops/commit  p99 {stats['p99_latency_ms']:>7.2f} ms")
+
+def benchmark(sessions, operations):
+    """
+    Runs the same concurrent dashboard writes with one commit per write and with group
+    commit, and prints the throughput, fsyncs per second and p99 commit latency of each.
+    """
+    data_dir = tempfile.mkdtemp(prefix="task-manager-group-commit-")
+    os.makedirs(os.path.join(data_dir, "database"))
+    previous_dir = os.getcwd()
+    # The stores open their files relative to the working directory.
+    os.chdir(data_dir)
+    try:
+        print(f"{sessions} sessions x {operations} writes")
+        run("single_commit", sessions, operations, max_delay=0, max_batch=1)
+        run("group_commit", sessions, operations, max_delay=MAX_DELAY_SECONDS, max_batch=MAX_BATCH)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare one commit per write with group commit under concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--operations", type=int, default=50, help="Writes per session.")
+    args = parser.parse_args()
+    benchmark(args.sessions, args.operations)
@@ -1,25 +1,25 @@
-import json
 import os
+import sys
 
-DATABASE_FILE = os.path.join(os.path.dirname(__file__), '..', 'database', 'tasks.txt')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from features.storage.store import RecordStore, thaw
 
-def _get_next_id(tasks):
-    if not tasks:
-        return 1
-    return max(task.get("id", 0) for task in tasks) + 1
+DATABASE_FILE = os.path.join(os.path.dirname(__file__), '..', 'database', 'tasks.txt')
 
 def fix_duplicate_ids():
     """
     Reads tasks from the database file, fixes any duplicate IDs, 
     and writes the corrected data back to the file.
     """
-    try:
-        with open(DATABASE_FILE, "r") as f:
-            tasks = [json.loads(line) for line in f]
-    except FileNotFoundError:
+    if not os.path.exists(DATABASE_FILE):
         print("No tasks file found. Nothing to fix.")
         return
 
+    # Reading through the store folds any pending journal entries into the result.
+    store = RecordStore(DATABASE_FILE)
+    tasks = [thaw(task) for task in store.records()]
+
     print("Checking for duplicate task IDs...")
     
     cleaned_tasks = []
@@ -28,14 +28,14 @@ def fix_duplicate_ids():
 
     for task in tasks:
         if "id" not in task:
-            task["id"] = _get_next_id(cleaned_tasks)
+            task["id"] = store.next_id()
             print(f"Task '{task.get('title', 'Untitled')}' was missing an ID. Assigned new ID: {task['id']}")
             duplicates_found = True
 
         if task["id"] in seen_ids:
             duplicates_found = True
             old_id = task["id"]
-            new_id = _get_next_id(cleaned_tasks)
+            new_id = store.next_id()
             task["id"] = new_id
             print(f"Found duplicate ID {old_id}. Assigning new ID: {new_id} to task '{task.get('title', 'Untitled')}'")
         
@@ -44,9 +44,7 @@ def fix_duplicate_ids():
 
     if duplicates_found:
         print("\nDuplicates were found and fixed. Writing corrected data back to tasks.txt...")
-        with open(DATABASE_FILE, "w") as f:
-            for task in cleaned_tasks:
-                f.write(json.dumps(task) + "\n")
+        store.replace_all(cleaned_tasks)
         print("Successfully fixed duplicate IDs.")
     else:
         print("No duplicate IDs found. Your data is clean!")
@@ -0,0 +1,60 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# User shards are found relative to the repository root.
+os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+
+from features.storage.partitions import list_owners, owner_path
+from features.storage.store import RecordStore, SQLITE_DATABASE_FILE
+from features.storage.sqlite_store import SqliteStore
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+DATABASE_DIR = os.path.join(ROOT_DIR, 'database')
+
+# (JSON-lines file, key field) for every entity the app stores.
+ENTITIES = [
+    ("tasks.txt", "id"),
+    ("reminders.txt", "id"),
+    ("categories.txt", "id"),
+    ("users.txt", "username"),
+]
+# Entities kept per user (see features/storage/partitions.py).
+USER_ENTITIES = ENTITIES[:3]
+
+def _migrate_files(directory, db_path, entities):
+    for file_name, key in entities:
+        source = RecordStore(os.path.join(directory, file_name), key)
+        records = source.records()
+
+        keys = [record.get(key) for record in records]
+        if None in keys:
+            print(f"Skipping {file_name}: some records have no '{key}'. Run tools/fix_duplicate_ids.py first.")
+            continue
+        if len(set(keys)) != len(keys):
+            print(f"Skipping {file_name}: duplicate '{key}' values found. Run tools/fix_duplicate_ids.py first.")
+            continue
+
+        table = os.path.splitext(file_name)[0]
+        SqliteStore(db_path, table, key).replace_all(records)
+        print(f"Migrated {len(records)} records from {file_name} into table '{table}'.")
+
+def migrate_to_sqlite():
+    """
+    Copies every entity from the JSON-lines files (including pending journal entries)
+    into the SQLite database, and every user's shard into that user's own database
+    file. Running it again replaces the tables with the current files.
+    """
+    db_path = os.path.join(ROOT_DIR, SQLITE_DATABASE_FILE)
+    print(f"Migrating JSON-lines data into {os.path.normpath(db_path)}...")
+    _migrate_files(DATABASE_DIR, db_path, ENTITIES)
+
+    for owner in list_owners():
+        user_db_path = owner_path(SQLITE_DATABASE_FILE, owner)
+        print(f"\nMigrating {owner}'s data into {os.path.normpath(user_db_path)}...")
+        _migrate_files(os.path.dirname(user_db_path), user_db_path, USER_ENTITIES)
+
+    print("\nDone. Start the app with TASK_MANAGER_STORAGE=sqlite to use the SQLite backend.")
+
+if __name__ == "__main__":
+    migrate_to_sqlite()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The feature modules open their data files relative to the repository root.
+os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+
+from features.analytics import analytics
+from features.storage.partitions import list_owners
+
+def rebuild():
+    """
+    Rebuilds the incremental analytics aggregates from the stored tasks, shared and
+    every user's, and checks them against a full recomputation.
+    """
+    print("Rebuilding analytics aggregates...")
+    mismatches = []
+    for owner in [None, *list_owners()]:
+        label = f"{owner}: " if owner is not None else ""
+        mismatches.extend(label + name for name in analytics.rebuild_analytics(owner))
+    if mismatches:
+        print(f"Mismatch in: {', '.join(mismatches)}")
+        sys.exit(1)
+    print("Aggregates match a full recomputation.")
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,32 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# The feature modules open their data files relative to the repository root.
+os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+
+from features.reminders.reminders import start_reminder_schedulers
+from features.reminders.scheduler import ConsoleSink, FileSink
+
+def run(log_file=None):
+    """
+    Runs the reminder scheduler (shared reminders and every user's) on its own,
+    without the Streamlit app, until interrupted.
+    """
+    sinks = [ConsoleSink()]
+    if log_file:
+        sinks.append(FileSink(log_file))
+    scheduler = start_reminder_schedulers(sinks)
+    print(f"Reminder scheduler running for {len(scheduler.stores)} reminder store(s). Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fire due reminders in the background.")
+    parser.add_argument("--log-file", help="Also append fired reminders as JSON lines to this file.")
+    run(parser.parse_args().log_file)
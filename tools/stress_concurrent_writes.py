@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+OPERATIONS = ("add", "edit", "track")
+
+def _worker(worker_index, operation_count, data_dir, shared_task_id, results):
+    """
+    Runs one worker process: a mix of adding tasks, editing the shared task and tracking time.
+    """
+    # The feature modules open their data files relative to the working directory.
+    os.chdir(data_dir)
+    from features.tasks import tasks
+
+    own_task = tasks.add_task_data(f"worker {worker_index}", "", "Stress", "Low", None, [])
+    counts = dict.fromkeys(OPERATIONS, 0)
+
+    def increment(task):
+        task["counter"] = task.get("counter", 0) + 1
+
+    for i in range(operation_count):
+        operation = OPERATIONS[i % len(OPERATIONS)]
+        if operation == "add":
+            tasks.add_task_data(f"worker {worker_index} task {i}", "", "Stress", "Low", None, [])
+        elif operation == "edit":
+            tasks.update_task(shared_task_id, increment)
+        else:
+            tasks.start_time_tracking(own_task["id"])
+            tasks.stop_time_tracking(own_task["id"])
+        counts[operation] += 1
+    results.put((worker_index, own_task["id"], counts))
+
+def stress(workers, operations, backend):
+    """
+    Runs worker processes that write to the same task store at once, then checks that no
+    write was lost: every added task exists with a unique ID, every increment of the shared
+    task's counter is there, and every tracked session left a time entry.
+    """
+    data_dir = tempfile.mkdtemp(prefix="task-manager-stress-")
+    os.makedirs(os.path.join(data_dir, "database"))
+    os.environ["TASK_MANAGER_STORAGE"] = backend
+    previous_dir = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        from features.tasks import tasks
+        shared_task = tasks.add_task_data("shared", "", "Stress", "Low", None, [])
+
+        # Spawned workers start with no open files or cached stores inherited from this process.
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [
+            context.Process(target=_worker, args=(index, operations, data_dir, shared_task["id"], results))
+            for index in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        worker_results = []
+        while len(worker_results) < workers:
+            try:
+                worker_results.append(results.get(timeout=1))
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break # A worker died without reporting
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        failed_workers = sum(1 for process in processes if process.exitcode != 0)
+
+        totals = dict.fromkeys(OPERATIONS, 0)
+        for _, _, counts in worker_results:
+            for operation, count in counts.items():
+                totals[operation] += count
+
+        all_tasks = tasks.get_all_tasks()
+        ids = [task["id"] for task in all_tasks]
+        tasks_by_id = {task["id"]: task for task in all_tasks}
+        expected_tasks = 1 + workers + totals["add"]
+        counter = tasks_by_id.get(shared_task["id"], {}).get("counter", 0)
+        entries = sum(len(tasks_by_id[own_id]["time_entries"]) for _, own_id, _ in worker_results if own_id in tasks_by_id)
+
+        checks = [
+            ("failed workers", 0, failed_workers),
+            ("tasks", expected_tasks, len(all_tasks)),
+            ("unique task IDs", expected_tasks, len(set(ids))),
+            ("shared counter", totals["edit"], counter),
+            ("time entries", totals["track"], entries),
+        ]
+        total_operations = sum(totals.values())
+        print(f"{backend}: {workers} workers x {operations} operations in {elapsed:.2f}s ({total_operations / elapsed:.0f} ops/s)")
+        for name, expected, actual in checks:
+            print(f"  {name:<16} expected {expected:>6}  found {actual:>6}  {'ok' if expected == actual else 'LOST WRITES'}")
+        return all(expected == actual for _, expected, actual in checks)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress concurrent writes from several processes and check for lost updates.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=300, help="Operations per worker.")
+    parser.add_argument("--backend", choices=["jsonl", "sqlite"], default="jsonl")
+    args = parser.parse_args()
+    sys.exit(0 if stress(args.workers, args.operations, args.backend) else 1)